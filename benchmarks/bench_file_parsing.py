@@ -0,0 +1,110 @@
+"""
+Micro-benchmark of parsing WebDAV multistatus entries into File objects
+
+Compares current File with the previous implementation (regex tag stripping,
+namespace map lookups and instance __dict__) on a synthetic multistatus
+document with 100k entries. Run from repository root:
+
+    python benchmarks/bench_file_parsing.py [entries]
+"""
+import re
+import sys
+import time
+from os.path import dirname, join
+
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'src'))
+
+from nextcloud.api_wrappers.webdav import File  # noqa: E402
+
+ENTRY = """<d:response>
+  <d:href>/remote.php/dav/files/admin/folder/file_{idx}.txt</d:href>
+  <d:propstat>
+    <d:prop>
+      <d:getlastmodified>Mon, 20 Jan 2020 20:41:00 GMT</d:getlastmodified>
+      <d:getetag>"5e260f4c{idx:08x}"</d:getetag>
+      <d:getcontenttype>text/plain</d:getcontenttype>
+      <d:resourcetype/>
+      <d:getcontentlength>{idx}</d:getcontentlength>
+      <oc:fileid>{idx}</oc:fileid>
+      <oc:permissions>RGDNVW</oc:permissions>
+      <oc:size>{idx}</oc:size>
+      <nc:has-preview>false</nc:has-preview>
+      <oc:favorite>0</oc:favorite>
+      <oc:comments-unread>0</oc:comments-unread>
+      <oc:owner-display-name>admin</oc:owner-display-name>
+      <oc:share-types/>
+    </d:prop>
+    <d:status>HTTP/1.1 200 OK</d:status>
+  </d:propstat>
+</d:response>"""
+
+
+class LegacyFile(object):
+    """ File implementation before __slots__ and precomputed tag mapping """
+    SUCCESS_STATUS = File.SUCCESS_STATUS
+    FILE_PROPERTIES = File.FILE_PROPERTIES
+    xml_namespaces_map = File.xml_namespaces_map
+
+    def __init__(self, xml_data):
+        self.href = xml_data.find('d:href', self.xml_namespaces_map).text
+        for propstat in xml_data.iter('{DAV:}propstat'):
+            if propstat.find('d:status', self.xml_namespaces_map).text != self.SUCCESS_STATUS:
+                continue
+            for file_property in propstat.find('d:prop', self.xml_namespaces_map):
+                file_property_name = re.sub("{.*}", "", file_property.tag)
+                if file_property_name not in self.FILE_PROPERTIES:
+                    continue
+                if file_property_name == 'resourcetype':
+                    value = self._extract_resource_type(file_property)
+                else:
+                    value = file_property.text
+                setattr(self, self.FILE_PROPERTIES[file_property_name], value)
+
+    def _extract_resource_type(self, file_property):
+        file_type = list(file_property)
+        if file_type:
+            return re.sub("{.*}", "", file_type[0].tag)
+        return None
+
+    def as_dict(self):
+        return {key: value
+                for key, value in self.__dict__.items()
+                if key in self.FILE_PROPERTIES.values()}
+
+
+def build_multistatus(entries):
+    return "".join(
+        ['<?xml version="1.0"?>\n<d:multistatus xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns"'
+         ' xmlns:nc="http://nextcloud.org/ns">']
+        + [ENTRY.format(idx=idx) for idx in range(entries)]
+        + ['</d:multistatus>'])
+
+
+def bench(file_class, xml_root, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for single_file in xml_root:
+            file_class(single_file).as_dict()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(xml_root) / best
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    xml_root = ET.fromstring(build_multistatus(entries))
+    assert ([File(each).as_dict() for each in xml_root[:100]]
+            == [LegacyFile(each).as_dict() for each in xml_root[:100]])
+    legacy = bench(LegacyFile, xml_root)
+    current = bench(File, xml_root)
+    print("entries: {}".format(entries))
+    print("before: {:>10.0f} entries/s".format(legacy))
+    print("after:  {:>10.0f} entries/s".format(current))
+    print("speedup: {:.2f}x".format(current / legacy))
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,11 @@ setuptools.setup(
     packages=setuptools.find_packages(PKGDIR),
     include_package_data=True,
     install_requires=['requests'],
+    extras_require={'async': ['httpx']},
     package_dir={'': 'src'},
+    entry_points={
+        'console_scripts': ['nextcloud-provision-users=nextcloud.provisioning:main'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
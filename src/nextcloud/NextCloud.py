@@ -1,28 +1,166 @@
 # -*- coding: utf-8 -*-
-from .requester import OCSRequester, WebDAVRequester
-from .api_wrappers import OCS_API_CLASSES, WEBDAV_CLASS
+import inspect
+from functools import wraps
+
+from .requester import (OCSRequester, WebDAVRequester, AsyncOCSRequester, AsyncWebDAVRequester,
+                        build_session, build_async_client,
+                        DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE,
+                        DEFAULT_ASYNC_MAX_CONNECTIONS, DEFAULT_ASYNC_MAX_KEEPALIVE_CONNECTIONS)
+from .batch import Batch
+from .index import RemoteIndex
+from .provisioning import UserProvisioning, PROVISIONING_MAX_WORKERS
+from .sync import DirectorySync, SyncMode
+from .api_wrappers import (OCS_API_CLASSES, WEBDAV_CLASS,
+                           ASYNC_OCS_API_CLASSES, ASYNC_WEBDAV_CLASS)
+from .api_wrappers.webdav import DEFAULT_MAX_WORKERS
+
+
+def bind_api_methods(target, functionality_classes, method_decorator=None):
+    """
+    Set public methods of api wrappers as attributes of target
+
+    Args:
+        target: object to set methods on
+        functionality_classes (list): api wrapper instances
+        method_decorator (callable): (optional) applied to every method before setting it
+    """
+    for functionality_class in functionality_classes:
+        for potential_method in dir(functionality_class):
+            if(
+                potential_method.startswith('_')
+                or not callable(getattr(functionality_class, potential_method))
+            ):
+                continue
+            method = getattr(functionality_class, potential_method)
+            if method_decorator is not None:
+                method = method_decorator(method)
+            setattr(target, potential_method, method)
+
+
+def as_coroutine_function(method):
+    """
+    Make method always return awaitable, async generators are kept as they are
+
+    Methods inherited from synchronous api wrappers return requester coroutine,
+    but can return plain value without request, e.g. when arguments are invalid.
+    """
+    if inspect.iscoroutinefunction(method) or inspect.isasyncgenfunction(method):
+        return method
+
+    @wraps(method)
+    async def wrapper(*args, **kwargs):
+        result = method(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+    return wrapper
 
 
 class NextCloud(object):
 
-    def __init__(self, endpoint, user, password, json_output=True):
+    def __init__(self, endpoint, user, password, json_output=True,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 keep_alive=True):
+        """
+        Args:
+            endpoint (str): NextCloud instance url
+            user (str): username
+            password (str): password
+            json_output (bool): parse responses as json
+            pool_connections (int): number of per-host connection pools to cache
+            pool_maxsize (int): maximum number of connections kept open to a single host,
+                should be at least the number of threads sharing this instance
+            keep_alive (bool): reuse connections between requests
+        """
         self.user = user
         self.query_components = []
 
-        ocs_requester = OCSRequester(endpoint, user, password, json_output)
-        webdav_requester = WebDAVRequester(endpoint, user, password)
+        # all api wrappers share one connection pool
+        self.session = build_session(pool_connections=pool_connections,
+                                     pool_maxsize=pool_maxsize,
+                                     keep_alive=keep_alive)
+        ocs_requester = OCSRequester(endpoint, user, password, json_output, session=self.session)
+        webdav_requester = WebDAVRequester(endpoint, user, password, session=self.session)
 
         self.functionality_classes = [api_class(ocs_requester) for api_class in OCS_API_CLASSES]
         self.functionality_classes.append(WEBDAV_CLASS(webdav_requester, json_output=json_output))
 
-        for functionality_class in self.functionality_classes:
-            for potential_method in dir(functionality_class):
-                if(
-                    potential_method.startswith('_')
-                    or not callable(getattr(functionality_class, potential_method))
-                ):
-                    continue
-                setattr(self, potential_method, getattr(functionality_class, potential_method))
+        bind_api_methods(self, self.functionality_classes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Close all pooled connections to NextCloud """
+        self.session.close()
+
+    def batch(self, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        Get batch to collect api calls and run them concurrently
+
+        Args:
+            max_workers (int): number of calls run at once, more than pool_maxsize
+                workers won't be able to reuse connections
+
+        Returns:
+            Batch
+        """
+        return Batch(self, max_workers=max_workers)
+
+    def remote_index(self, uid, db_path, path=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Get persistent local index of files of user folder tree
+
+        Args:
+            uid (str): uid of user
+            db_path (str): path of SQLite database, created if it doesn't exist
+            path (str/None): path of indexed folder, user root by default
+            max_workers (int): maximum number of folders listed at once by refresh
+
+        Returns:
+            RemoteIndex
+        """
+        return RemoteIndex(self, uid, db_path, path=path, max_workers=max_workers)
+
+    def sync(self, uid, local_dir, remote_dir, mode=SyncMode.BIDIRECTIONAL, state_path=None,
+             max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Sync local directory with Nextcloud folder of user, see DirectorySync
+
+        Args:
+            uid (str): uid of user
+            local_dir (str): path of local directory
+            remote_dir (str): path of Nextcloud folder
+            mode (str): "push", "pull" or "bidirectional"
+            state_path (str): (optional) path of sync state database, by default
+                it's kept in local directory
+            max_workers (int): number of transfers run at once
+
+        Returns:
+            list of SyncAction, one for every file which needed syncing
+        """
+        with DirectorySync(self, uid, local_dir, remote_dir, mode=mode, state_path=state_path,
+                           max_workers=max_workers) as directory_sync:
+            return directory_sync.run()
+
+    def provision_users(self, records, log_file=None, max_workers=PROVISIONING_MAX_WORKERS):
+        """
+        Create and update users from records concurrently, see UserProvisioning
+
+        Args:
+            records (iterable): user records, e.g. read_records("users.csv")
+            log_file (file object): (optional) text file to write result of every
+                record to, as line of JSON
+            max_workers (int): number of records processed at once
+
+        Returns:
+            list of ProvisioningResult, in order of finished records
+        """
+        provisioning = UserProvisioning(self, max_workers=max_workers)
+        return list(provisioning.run(records, log_file=log_file))
 
     def get_connection_issues(self):
         """
@@ -36,3 +174,78 @@ class NextCloud(object):
 
         if not response.is_ok:
             return response.meta["message"]
+
+
+class AsyncNextCloud(object):
+    """
+    Asynchronous NextCloud client, every api method is a coroutine function
+
+    Has the same api methods as NextCloud, requests are sent through one
+    httpx.AsyncClient connection pool, so many of them can run concurrently:
+
+        async with AsyncNextCloud(endpoint, user, password) as nxc:
+            responses = await asyncio.gather(*[nxc.get_user(uid) for uid in uids])
+
+    Methods of NextCloud listed in SYNC_ONLY_METHODS, which aren't api methods
+    but helpers running them from threads, have no async counterparts: batch
+    (use asyncio.gather instead), remote_index, sync and provision_users.
+
+    Requires httpx to be installed.
+    """
+
+    SYNC_ONLY_METHODS = ("batch", "remote_index", "sync", "provision_users")
+
+    def __init__(self, endpoint, user, password, json_output=True,
+                 max_connections=DEFAULT_ASYNC_MAX_CONNECTIONS,
+                 max_keepalive_connections=DEFAULT_ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+                 keep_alive=True):
+        """
+        Args:
+            endpoint (str): NextCloud instance url
+            user (str): username
+            password (str): password
+            json_output (bool): parse responses as json
+            max_connections (int): maximum number of concurrently open connections,
+                further requests wait for a free connection
+            max_keepalive_connections (int): maximum number of idle connections kept open
+            keep_alive (bool): reuse connections between requests
+        """
+        self.user = user
+
+        # all api wrappers share one connection pool
+        self.session = build_async_client(max_connections=max_connections,
+                                          max_keepalive_connections=max_keepalive_connections,
+                                          keep_alive=keep_alive)
+        ocs_requester = AsyncOCSRequester(endpoint, user, password, json_output,
+                                          session=self.session)
+        webdav_requester = AsyncWebDAVRequester(endpoint, user, password, session=self.session)
+
+        self.functionality_classes = [api_class(ocs_requester)
+                                      for api_class in ASYNC_OCS_API_CLASSES]
+        self.functionality_classes.append(
+            ASYNC_WEBDAV_CLASS(webdav_requester, json_output=json_output))
+
+        bind_api_methods(self, self.functionality_classes, method_decorator=as_coroutine_function)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """ Close all pooled connections to NextCloud """
+        await self.session.aclose()
+
+    async def get_connection_issues(self):
+        """
+        Return Falsy falue if everything is OK, or string representing
+        the connection problem (bad hostname, password, whatever)
+        """
+        try:
+            response = await self.get_user(self.user)
+        except Exception as e:
+            return str(e)
+
+        if not response.is_ok:
+            return response.meta["message"]
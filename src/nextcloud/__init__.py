@@ -1,3 +1,2 @@
 # -*- coding: utf-8 -*-
-from .NextCloud import NextCloud
-
+from .NextCloud import NextCloud, AsyncNextCloud
@@ -1,11 +1,24 @@
 # -*- coding: utf-8 -*-
-from nextcloud.base import WithRequester
+from nextcloud.base import (WithRequester, DEFAULT_PREFETCH_PAGES, iter_pages, aiter_pages,
+                            iter_concurrently, aiter_concurrently)
+
+from .user import User, UserDetails, USERS_PAGE_SIZE
+
+GROUPS_PAGE_SIZE = 500
+# the same as default size of connection pool
+MEMBERSHIP_MAX_WORKERS = 10
 
 
 class Group(WithRequester):
     API_URL = "/ocs/v1.php/cloud/groups"
     SUCCESS_CODE = 100
 
+    def __init__(self, requester):
+        super(Group, self).__init__(requester)
+        # memberships are changed through users api
+        self._users_requester = self._requester.with_context(api_url=User.API_URL,
+                                                             success_code=User.SUCCESS_CODE)
+
     def get_groups(self, search=None, limit=None, offset=None):
         """
         Retrieve a list of groups from the Nextcloud server
@@ -22,6 +35,33 @@ class Group(WithRequester):
         }
         return self.requester.get(params=params)
 
+    def iter_groups(self, search=None, page_size=GROUPS_PAGE_SIZE,
+                    prefetch=DEFAULT_PREFETCH_PAGES):
+        """
+        Iterate over groups of the Nextcloud server, fetching pages of them in background
+
+        While ids of one page are yielded, up to prefetch following pages are
+        requested concurrently, so listing all groups isn't slowed down by waiting
+        for every page in turn. Requests are sent when iteration starts.
+
+        :param search: string, optional search string
+        :param page_size: int, number of groups requested at once
+        :param prefetch: int, number of pages requested ahead, 0 requests them one by one
+        :return: iterator of group ids
+        """
+        def fetch_page(offset):
+            res = self.get_groups(search=search, limit=page_size, offset=offset)
+            return self._get_listed_groups(res)
+
+        yield from iter_pages(fetch_page, page_size, prefetch)
+
+    @staticmethod
+    def _get_listed_groups(res):
+        if not res.is_ok:
+            raise ValueError("Failed to list groups, status code: {}"
+                             .format(getattr(res, 'status_code', None)))
+        return res.data['groups']
+
     def add_group(self, gid):
         """
         Add a new group
@@ -41,6 +81,142 @@ class Group(WithRequester):
         """
         return self.requester.get("{gid}".format(gid=gid))
 
+    def get_group_members_details(self, gid, search=None, limit=None, offset=None):
+        """
+        Retrieve a list of group members with their details
+
+        :param gid: str, group name
+        :param search: string, optional search string
+        :param limit: int, optional limit value
+        :param offset: int, optional offset value
+        :return: response, data['users'] maps user ids to their details
+        """
+        params = {
+            'search': search,
+            'limit': limit,
+            'offset': offset
+        }
+        return self.requester.get("{gid}/users/details".format(gid=gid), params=params)
+
+    def iter_group_members(self, gid, details=True, page_size=USERS_PAGE_SIZE,
+                           prefetch=DEFAULT_PREFETCH_PAGES):
+        """
+        Iterate over members of the group
+
+        With details, members are fetched page by page, following pages are
+        fetched in background as by iter_groups. Without them, all member ids
+        are fetched in one request.
+
+        :param gid: str, group name
+        :param details: bool, yield UserDetails of members instead of their ids
+        :param page_size: int, number of members requested at once
+        :param prefetch: int, number of pages requested ahead, 0 requests them one by one
+        :return: iterator of UserDetails or user ids
+        """
+        if not details:
+            yield from self._get_group_members(self.get_group(gid))
+            return
+
+        def fetch_page(offset):
+            res = self.get_group_members_details(gid, limit=page_size, offset=offset)
+            return self._get_listed_members_details(res)
+
+        yield from iter_pages(fetch_page, page_size, prefetch)
+
+    def membership_matrix(self, max_workers=MEMBERSHIP_MAX_WORKERS):
+        """
+        Get members and subadmins of all groups of the Nextcloud server
+
+        Groups are listed by iter_groups, then members and subadmins of every
+        group are fetched concurrently, two requests per group.
+
+        :param max_workers: int, number of requests run at once
+        :return: MembershipMatrix
+        """
+        matrix = MembershipMatrix()
+        requests = [(gid, kind) for gid in self.iter_groups() for kind in MembershipMatrix.KINDS]
+        for request, res, exception in iter_concurrently(self._get_membership, requests,
+                                                         max_workers):
+            if exception is not None:
+                raise exception
+            matrix.add(*request, self._get_membership_uids(request[1], res))
+        return matrix
+
+    def reconcile_memberships(self, desired, dry_run=False, max_workers=MEMBERSHIP_MAX_WORKERS):
+        """
+        Make members of groups exactly the desired ones, with as few requests as possible
+
+        Current members of the desired groups are fetched concurrently, one
+        request per group, then only users who are missing are added and only
+        users who aren't desired are removed, concurrently. Groups not in
+        desired are left as they are, groups must exist.
+
+        :param desired: dict, group id -> set of ids of its desired members
+        :param dry_run: bool, only return planned changes without making them
+        :param max_workers: int, number of requests run at once
+        :return: list of MembershipChange, one for every added or removed member
+        """
+        current = {}
+        for gid, res, exception in iter_concurrently(self.get_group, list(desired), max_workers):
+            if exception is not None:
+                raise exception
+            current[gid] = self._get_group_members(res)
+        changes = self._get_membership_changes(desired, current)
+        if dry_run:
+            return changes
+        for change, res, exception in iter_concurrently(self._apply_membership_change, changes,
+                                                        max_workers):
+            change.result, change.exception = res, exception
+        return changes
+
+    @staticmethod
+    def _get_membership_changes(desired, current):
+        """ Get changes needed to turn current members of groups into desired ones """
+        changes = []
+        for gid, uids in desired.items():
+            current_uids = set(current[gid])
+            changes.extend(MembershipChange(MembershipChange.ADD, gid, uid)
+                           for uid in sorted(set(uids) - current_uids))
+            changes.extend(MembershipChange(MembershipChange.REMOVE, gid, uid)
+                           for uid in sorted(current_uids - set(uids)))
+        return changes
+
+    def _apply_membership_change(self, change):
+        url = "{uid}/groups".format(uid=change.uid)
+        msg = {'groupid': change.gid}
+        if change.action == MembershipChange.ADD:
+            return self._users_requester.post(url, msg)
+        return self._users_requester.delete(url, msg)
+
+    def _get_membership(self, request):
+        gid, kind = request
+        if kind == MembershipMatrix.MEMBERS:
+            return self.get_group(gid)
+        return self.get_subadmins(gid)
+
+    @classmethod
+    def _get_membership_uids(cls, kind, res):
+        if kind == MembershipMatrix.MEMBERS:
+            return cls._get_group_members(res)
+        if not res.is_ok:
+            raise ValueError("Failed to list subadmins, status code: {}"
+                             .format(getattr(res, 'status_code', None)))
+        return res.data
+
+    @staticmethod
+    def _get_group_members(res):
+        if not res.is_ok:
+            raise ValueError("Failed to list group members, status code: {}"
+                             .format(getattr(res, 'status_code', None)))
+        return res.data['users']
+
+    @staticmethod
+    def _get_listed_members_details(res):
+        if not res.is_ok:
+            raise ValueError("Failed to list group members, status code: {}"
+                             .format(getattr(res, 'status_code', None)))
+        return UserDetails.from_users_data(res.data['users'])
+
     def get_subadmins(self, gid):
         """
         List subadmins of the group
@@ -58,3 +234,117 @@ class Group(WithRequester):
         :return:
         """
         return self.requester.delete("{gid}".format(gid=gid))
+
+
+class AsyncGroup(Group):
+    """ Group API wrapper for AsyncNextCloud """
+
+    async def iter_groups(self, search=None, page_size=GROUPS_PAGE_SIZE,
+                          prefetch=DEFAULT_PREFETCH_PAGES):
+        async def fetch_page(offset):
+            res = await self.get_groups(search=search, limit=page_size, offset=offset)
+            return self._get_listed_groups(res)
+
+        async for group_id in aiter_pages(fetch_page, page_size, prefetch):
+            yield group_id
+
+    async def iter_group_members(self, gid, details=True, page_size=USERS_PAGE_SIZE,
+                                 prefetch=DEFAULT_PREFETCH_PAGES):
+        if not details:
+            for uid in self._get_group_members(await self.get_group(gid)):
+                yield uid
+            return
+
+        async def fetch_page(offset):
+            res = await self.get_group_members_details(gid, limit=page_size, offset=offset)
+            return self._get_listed_members_details(res)
+
+        async for user_details in aiter_pages(fetch_page, page_size, prefetch):
+            yield user_details
+
+    async def membership_matrix(self, max_workers=MEMBERSHIP_MAX_WORKERS):
+        matrix = MembershipMatrix()
+        requests = [(gid, kind) async for gid in self.iter_groups()
+                    for kind in MembershipMatrix.KINDS]
+        async for request, res, exception in aiter_concurrently(self._get_membership, requests,
+                                                                max_workers):
+            if exception is not None:
+                raise exception
+            matrix.add(*request, self._get_membership_uids(request[1], res))
+        return matrix
+
+    async def reconcile_memberships(self, desired, dry_run=False,
+                                    max_workers=MEMBERSHIP_MAX_WORKERS):
+        current = {}
+        async for gid, res, exception in aiter_concurrently(self.get_group, list(desired),
+                                                            max_workers):
+            if exception is not None:
+                raise exception
+            current[gid] = self._get_group_members(res)
+        changes = self._get_membership_changes(desired, current)
+        if dry_run:
+            return changes
+        async for change, res, exception in aiter_concurrently(self._apply_membership_change,
+                                                               changes, max_workers):
+            change.result, change.exception = res, exception
+        return changes
+
+
+class MembershipMatrix(object):
+    """
+    Members and subadmins of groups, indexed both by group and by user
+
+    Attributes:
+        group_users (dict): group id -> set of ids of its members
+        user_groups (dict): user id -> set of ids of groups the user is member of
+        group_subadmins (dict): group id -> set of ids of its subadmins
+        user_subadmin_groups (dict): user id -> set of ids of groups the user is subadmin of
+    """
+
+    MEMBERS = "members"
+    SUBADMINS = "subadmins"
+    KINDS = (MEMBERS, SUBADMINS)
+
+    def __init__(self):
+        self.group_users = {}
+        self.user_groups = {}
+        self.group_subadmins = {}
+        self.user_subadmin_groups = {}
+
+    def add(self, gid, kind, uids):
+        """ Add members or subadmins of group """
+        if kind == self.MEMBERS:
+            by_group, by_user = self.group_users, self.user_groups
+        else:
+            by_group, by_user = self.group_subadmins, self.user_subadmin_groups
+        by_group.setdefault(gid, set()).update(uids)
+        for uid in uids:
+            by_user.setdefault(uid, set()).add(gid)
+
+    def __repr__(self):
+        return "<MembershipMatrix: {} groups, {} users>".format(
+            len(self.group_users), len(self.user_groups))
+
+
+class MembershipChange(object):
+    """ User added to or removed from group by Group.reconcile_memberships, and its outcome """
+
+    ADD = "add"
+    REMOVE = "remove"
+
+    def __init__(self, action, gid, uid):
+        self.action = action
+        self.gid = gid
+        self.uid = uid
+        self.result = None
+        self.exception = None
+
+    @property
+    def is_ok(self):
+        """ Change was made successfully, planned changes are not ok yet """
+        if self.exception is not None:
+            return False
+        return getattr(self.result, 'is_ok', False)
+
+    def __repr__(self):
+        return "<MembershipChange: {} {} {}>".format(self.action, self.uid, self.gid)
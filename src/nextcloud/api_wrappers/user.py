@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from nextcloud.base import WithRequester
+from nextcloud.base import WithRequester, DEFAULT_PREFETCH_PAGES, iter_pages, aiter_pages
+
+USERS_PAGE_SIZE = 500
 
 
 class User(WithRequester):
@@ -48,6 +50,76 @@ class User(WithRequester):
         }
         return self.requester.get(params=params)
 
+    def iter_users(self, search=None, page_size=USERS_PAGE_SIZE,
+                   prefetch=DEFAULT_PREFETCH_PAGES):
+        """
+        Iterate over users of the Nextcloud server, fetching pages of them in background
+
+        While ids of one page are yielded, up to prefetch following pages are
+        requested concurrently, so listing all users isn't slowed down by waiting
+        for every page in turn. Requests are sent when iteration starts.
+
+        :param search: string, optional search string
+        :param page_size: int, number of users requested at once
+        :param prefetch: int, number of pages requested ahead, 0 requests them one by one
+        :return: iterator of user ids
+        """
+        def fetch_page(offset):
+            res = self.get_users(search=search, limit=page_size, offset=offset)
+            return self._get_listed_users(res)
+
+        yield from iter_pages(fetch_page, page_size, prefetch)
+
+    @staticmethod
+    def _get_listed_users_details(res):
+        if not res.is_ok:
+            raise ValueError("Failed to list users, status code: {}"
+                             .format(getattr(res, 'status_code', None)))
+        return UserDetails.from_users_data(res.data['users'])
+
+    @staticmethod
+    def _get_listed_users(res):
+        if not res.is_ok:
+            raise ValueError("Failed to list users, status code: {}"
+                             .format(getattr(res, 'status_code', None)))
+        return res.data['users']
+
+    def get_users_details(self, search=None, limit=None, offset=None):
+        """
+        Retrieve a list of users with their details, like get_user returns, in one request
+
+        :param search: string, optional search string
+        :param limit: int, optional limit value
+        :param offset: int, optional offset value
+        :return: response, data['users'] maps user ids to their details
+        """
+        params = {
+            'search': search,
+            'limit': limit,
+            'offset': offset
+        }
+        return self.requester.get("details", params=params)
+
+    def iter_users_details(self, search=None, page_size=USERS_PAGE_SIZE,
+                           prefetch=DEFAULT_PREFETCH_PAGES):
+        """
+        Iterate over details of users of the Nextcloud server, page by page
+
+        Details of whole page of users are fetched in one request, instead of
+        get_user call per user, following pages are fetched in background as
+        by iter_users.
+
+        :param search: string, optional search string
+        :param page_size: int, number of users requested at once
+        :param prefetch: int, number of pages requested ahead, 0 requests them one by one
+        :return: iterator of UserDetails
+        """
+        def fetch_page(offset):
+            res = self.get_users_details(search=search, limit=page_size, offset=offset)
+            return self._get_listed_users_details(res)
+
+        yield from iter_pages(fetch_page, page_size, prefetch)
+
     def get_user(self, uid):
         """
         Retrieve information about a single user
@@ -179,3 +251,81 @@ class User(WithRequester):
         """
         url = "{uid}/welcome".format(uid=uid)
         return self.requester.post(url)
+
+
+class AsyncUser(User):
+    """ User API wrapper for AsyncNextCloud """
+
+    async def iter_users(self, search=None, page_size=USERS_PAGE_SIZE,
+                         prefetch=DEFAULT_PREFETCH_PAGES):
+        async def fetch_page(offset):
+            res = await self.get_users(search=search, limit=page_size, offset=offset)
+            return self._get_listed_users(res)
+
+        async for user_id in aiter_pages(fetch_page, page_size, prefetch):
+            yield user_id
+
+    async def iter_users_details(self, search=None, page_size=USERS_PAGE_SIZE,
+                                 prefetch=DEFAULT_PREFETCH_PAGES):
+        async def fetch_page(offset):
+            res = await self.get_users_details(search=search, limit=page_size, offset=offset)
+            return self._get_listed_users_details(res)
+
+        async for user_details in aiter_pages(fetch_page, page_size, prefetch):
+            yield user_details
+
+
+class UserDetails(object):
+    """ Compact record of user details, as listed by User.iter_users_details """
+
+    DETAILS_FIELDS = {
+        "id": "id",
+        "enabled": "enabled",
+        "displayname": "display_name",
+        "email": "email",
+        "groups": "groups",
+        "subadmin": "subadmin",
+        "language": "language",
+        "backend": "backend",
+        "lastLogin": "last_login",
+    }
+    QUOTA_FIELDS = {
+        "quota": "quota",
+        "used": "quota_used",
+        "free": "quota_free",
+        "total": "quota_total",
+        "relative": "quota_relative",
+    }
+
+    __slots__ = tuple(DETAILS_FIELDS.values()) + tuple(QUOTA_FIELDS.values())
+
+    def __init__(self, data):
+        """
+        :param data: dict, details of single user from api response
+        """
+        for key, attribute_name in self.DETAILS_FIELDS.items():
+            setattr(self, attribute_name, data.get(key))
+        quota = data.get('quota')
+        if not isinstance(quota, dict):
+            quota = {}
+        for key, attribute_name in self.QUOTA_FIELDS.items():
+            setattr(self, attribute_name, quota.get(key))
+
+    @classmethod
+    def from_users_data(cls, users):
+        """
+        Parse users of api response
+
+        :param users: dict, details of users by user id
+        :return: list of UserDetails
+        """
+        # empty mapping is serialized as list
+        if not users:
+            return []
+        return [cls(dict(details, id=details.get('id', uid))) for uid, details in users.items()]
+
+    def as_dict(self):
+        return {attribute_name: getattr(self, attribute_name) for attribute_name in self.__slots__}
+
+    def __repr__(self):
+        return "<UserDetails: {}>".format(self.id)
@@ -161,6 +161,27 @@ class UserLDAP(WithRequester):
         return self.requester.delete(config_id)
 
 
+class AsyncUserLDAP(UserLDAP):
+    """ LDAP configuration API wrapper for AsyncNextCloud """
+
+    async def get_ldap_config_id(self, idx=1):
+        config_id = f"s{idx:02d}"
+        config = await self.get_ldap_config(config_id)
+        if config.is_ok:
+            return config_id
+        return None
+
+    async def get_ldap_lowest_existing_config_id(self, lower_bound=1, upper_bound=10):
+        for idx in range(lower_bound, upper_bound + 1):
+            config_id = await self.get_ldap_config_id(idx)
+            if config_id:
+                return config_id
+
+    async def ldap_cache_flush(self, config_id):
+        cache_val = await self.get_ldap_cache_ttl(config_id)
+        await self.set_ldap_cache_ttl(config_id, cache_val)
+
+
 for ldap_key in UserLDAP.CONFIG_KEYS:
     key_name = re.sub('ldap', '', ldap_key)
     key_name = re.sub('([a-z0-9])([A-Z])', r'\1_\2', key_name).lower()
@@ -176,7 +197,16 @@ for ldap_key in UserLDAP.CONFIG_KEYS:
         getter.__name__ = getter_name
         return getter
 
+    def async_getter_method(param):
+        async def getter(self, config_id):
+            res = await self.get_ldap_config(config_id)
+            data = res.data
+            return data[param]
+        getter.__name__ = getter_name
+        return getter
+
     setattr(UserLDAP, getter_name, getter_method(ldap_key))
+    setattr(AsyncUserLDAP, getter_name, async_getter_method(ldap_key))
 
     # create and add setter method
     setter_name = "set_ldap_{}".format(key_name)
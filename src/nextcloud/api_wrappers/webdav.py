@@ -1,21 +1,183 @@
 # -*- coding: utf-8 -*-
-import re
+import io
 import os
-import pathlib
+import json
+import asyncio
+import math
+import time
+import hashlib
+import uuid
+import threading
+import contextlib
+import tarfile
 
 import xml.etree.ElementTree as ET
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import unquote
+from xml.sax.saxutils import escape
 from datetime import datetime
-from nextcloud.base import WithRequester
+from nextcloud.base import WithRequester, iter_concurrently, aiter_concurrently
+
+from .capabilities import Capabilities
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RANGE_SIZE = 8 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+MAX_UPLOAD_CHUNKS = 10000
+DEFAULT_MAX_WORKERS = 4
+SEARCH_PAGE_SIZE = 500
+KNOWN_FOLDERS_CACHE_SIZE = 10000
+BULK_UPLOAD_BATCH_SIZE = 32 * 1024 * 1024
+BULK_UPLOAD_MAX_FILES = 100
+CHECKSUM_ALGORITHM = "SHA1"
+# files up to this size are kept in memory while checksum is computed, so they are read once
+CHECKSUM_IN_MEMORY_SIZE = 8 * 1024 * 1024
+
+
+@contextlib.contextmanager
+def _use_file_object(file_object):
+    """ Use file object in with statement without closing it """
+    yield file_object
+
+
+def _iter_async_chunks(chunks, loop):
+    """ Iterate from other thread over async iterator of bytes, which runs in given loop """
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(chunks.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
 
 
 class WebDAV(WithRequester):
 
     API_URL = "/remote.php/dav/files"
+    UPLOADS_API_URL = "/remote.php/dav/uploads"
+    DAV_API_URL = "/remote.php/dav"
+
+    ALL_PROPERTIES_PROPFIND = """<?xml version="1.0"?>
+        <d:propfind xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns"
+                    xmlns:nc="http://nextcloud.org/ns">
+          <d:prop>
+                <d:getlastmodified />
+                <d:getetag />
+                <d:getcontenttype />
+                <d:resourcetype />
+                <oc:fileid />
+                <oc:permissions />
+                <oc:size />
+                <d:getcontentlength />
+                <nc:has-preview />
+                <oc:favorite />
+                <oc:comments-unread />
+                <oc:owner-display-name />
+                <oc:share-types />
+                <oc:checksums />
+          </d:prop>
+        </d:propfind>
+    """
+    ARCHIVE_CONTENT_TYPES = {"zip": "application/zip", "tar": "application/x-tar"}
+    CHECKSUMS_PROPFIND = """<?xml version="1.0"?>
+        <d:propfind xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns">
+          <d:prop>
+                <d:getetag />
+                <d:resourcetype />
+                <oc:size />
+                <oc:checksums />
+          </d:prop>
+        </d:propfind>
+    """
+    FAVORITES_REPORT = """<?xml version="1.0"?>
+        <oc:filter-files xmlns:d="DAV:"
+                         xmlns:oc="http://owncloud.org/ns"
+                         xmlns:nc="http://nextcloud.org/ns">
+                 <oc:filter-rules>
+                         <oc:favorite>1</oc:favorite>
+                 </oc:filter-rules>
+         </oc:filter-files>
+    """
+
+    SYNC_COLLECTION_REPORT = """<?xml version="1.0"?>
+        <d:sync-collection xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns">
+          <d:sync-token>{sync_token}</d:sync-token>
+          <d:sync-level>{sync_level}</d:sync-level>{limit}
+          <d:prop>
+                <d:getlastmodified />
+                <d:getetag />
+                <d:getcontenttype />
+                <d:resourcetype />
+                <oc:fileid />
+                <oc:size />
+                <d:getcontentlength />
+          </d:prop>
+        </d:sync-collection>
+    """
+    SYNC_TOKEN_TAG = "{DAV:}sync-token"
+    SYNC_COLLECTION_LIMIT = """
+          <d:limit><d:nresults>{}</d:nresults></d:limit>"""
+
+    # key is NextCloud property which can be searched by, value is its namespace prefix
+    SEARCH_PROPERTIES = {
+        "displayname": "d",
+        "getcontenttype": "d",
+        "getcontentlength": "d",
+        "getlastmodified": "d",
+        "resourcetype": "d",
+        "fileid": "oc",
+        "favorite": "oc",
+        "owner-id": "oc",
+        "owner-display-name": "oc",
+        "size": "oc",
+        "creation_time": "nc",
+        "upload_time": "nc",
+    }
+    SEARCH_OPERATORS = ("eq", "lt", "lte", "gt", "gte", "like")
+    SEARCH_REQUEST = """<?xml version="1.0"?>
+        <d:searchrequest xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns"
+                         xmlns:nc="http://nextcloud.org/ns"
+                         xmlns:ns="https://github.com/icewind1991/SearchDAV/ns">
+          <d:basicsearch>
+            <d:select>
+              <d:prop>
+                <d:getlastmodified />
+                <d:getetag />
+                <d:getcontenttype />
+                <d:resourcetype />
+                <oc:fileid />
+                <oc:permissions />
+                <oc:size />
+                <d:getcontentlength />
+                <oc:favorite />
+              </d:prop>
+            </d:select>
+            <d:from>
+              <d:scope>
+                <d:href>{scope}</d:href>
+                <d:depth>infinity</d:depth>
+              </d:scope>
+            </d:from>
+            {where}
+            {order_by}
+            <d:limit>
+              <d:nresults>{limit}</d:nresults>
+              <ns:firstresult>{offset}</ns:firstresult>
+            </d:limit>
+          </d:basicsearch>
+        </d:searchrequest>
+    """
 
     def __init__(self, *args, **kwargs):
         super(WebDAV, self).__init__(*args)
         self.json_output = kwargs.get('json_output')
+        self._uploads_requester = self._requester.with_context(api_url=self.UPLOADS_API_URL)
+        self._dav_requester = self._requester.with_context(api_url=self.DAV_API_URL)
+        self._capabilities_requester = self._requester.with_context(api_url=Capabilities.API_URL)
+        self._bulk_upload_supported = None
+        # folders which are known to exist, by (uid, path)
+        self._known_folders = KnownFolders(kwargs.get('known_folders_cache_size',
+                                                      KNOWN_FOLDERS_CACHE_SIZE))
 
     def list_folders(self, uid, path=None, depth=1, all_properties=False):
         """
@@ -31,86 +193,387 @@ class WebDAV(WithRequester):
             list of dicts if json_output
             list of File objects if not json_output
         """
-        if all_properties:
-            data = """<?xml version="1.0"?>
-                <d:propfind xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns"
-                            xmlns:nc="http://nextcloud.org/ns">
-                  <d:prop>
-                        <d:getlastmodified />
-                        <d:getetag />
-                        <d:getcontenttype />
-                        <d:resourcetype />
-                        <oc:fileid />
-                        <oc:permissions />
-                        <oc:size />
-                        <d:getcontentlength />
-                        <nc:has-preview />
-                        <oc:favorite />
-                        <oc:comments-unread />
-                        <oc:owner-display-name />
-                        <oc:share-types />
-                  </d:prop>
-                </d:propfind>
-            """
-        else:
-            data = None
+        resp = self.requester.propfind(**self._get_propfind_kwargs(uid, path, depth, all_properties))
+        return self._get_files_response(resp)
+
+    def iter_folder(self, uid, path=None, depth=1, all_properties=False,
+                    chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Iterate over path files with files properties for given user, with given depth
+
+        Response is parsed incrementally while it's being received and every
+        file is yielded as soon as it's parsed, so memory use doesn't grow with
+        the number of files. Request is sent when iteration starts.
+
+        Args:
+            uid (str): uid of user
+            path (str/None): files path
+            depth (int): depth of listing files (directories content for example)
+            all_properties (bool): list all available file properties in Nextcloud
+            chunk_size (int): size of response chunks in bytes parsed at once
+
+        Returns:
+            iterator of dicts if json_output
+            iterator of File objects if not json_output
+        """
+        res = self.requester.propfind(stream=True,
+                                      **self._get_propfind_kwargs(uid, path, depth, all_properties))
+        try:
+            self._check_list_response(res)
+            parser = MultistatusParser()
+            for chunk in res.raw.iter_content(chunk_size):
+                for file_data in parser.feed(chunk):
+                    yield file_data.as_dict() if self.json_output else file_data
+            for file_data in parser.close():
+                yield file_data.as_dict() if self.json_output else file_data
+        finally:
+            res.raw.close()
+
+    def walk(self, uid, path=None, all_properties=False, max_workers=DEFAULT_MAX_WORKERS,
+             onerror=None):
+        """
+        Walk folder tree of given user, like os.walk
+
+        Every folder is listed with separate Depth: 1 request (Depth: infinity is
+        often disabled or too slow on servers), up to max_workers folders are
+        listed at once. Folders are yielded as soon as they are listed, so order
+        of folders is not defined, but folder is always yielded before its
+        subfolders. Like with os.walk, subfolders removed from yielded dirs
+        list are not walked.
+
+        Args:
+            uid (str): uid of user
+            path (str/None): path of top folder
+            all_properties (bool): list all available file properties in Nextcloud
+            max_workers (int): maximum number of folders listed at once
+            onerror (callable): (optional) called with exception raised by listing
+                of folder, which is skipped then, by default exception is raised
+
+        Returns:
+            iterator of (dirpath, dirs, files) tuples, dirpath is path of folder
+            relative to user root, dirs and files are lists of dicts if json_output,
+            lists of File objects if not json_output
+        """
+        def list_folder(folder_path):
+            return list(self.iter_folder(uid, folder_path, all_properties=all_properties))
+
+        pending = [(path or "").strip("/")]
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while pending or in_flight:
+                    while pending and len(in_flight) < max_workers:
+                        folder_path = pending.pop()
+                        in_flight[executor.submit(list_folder, folder_path)] = folder_path
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        folder_path = in_flight.pop(future)
+                        try:
+                            files_data = future.result()
+                        except Exception as e:
+                            if onerror is None:
+                                raise
+                            onerror(e)
+                            continue
+                        dirs, files = self._split_folder_listing(uid, folder_path, files_data)
+                        yield folder_path, dirs, files
+                        pending.extend(self._get_folder_paths(uid, dirs))
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def _split_folder_listing(self, uid, folder_path, files_data):
+        """ Split Depth: 1 listing of folder into lists of subfolders and files """
+        dirs, files = [], []
+        for file_data in files_data:
+            if self._get_href_path(uid, self._get_file_property(file_data, 'href')) == folder_path:
+                continue
+            resource_type = self._get_file_property(file_data, 'resource_type')
+            if resource_type == File.COLLECTION_RESOURCE_TYPE:
+                dirs.append(file_data)
+            else:
+                files.append(file_data)
+        return dirs, files
+
+    def _get_folder_paths(self, uid, dirs):
+        """ Get paths of listed subfolders relative to user root """
+        return [self._get_href_path(uid, self._get_file_property(each, 'href')) for each in dirs]
+
+    def _get_href_path(self, uid, href):
+        """ Get path of listed file relative to user root from its href """
+        user_url = "{}/{}/".format(self.API_URL, uid)
+        return unquote(href).partition(user_url)[2].strip("/")
+
+    @staticmethod
+    def _check_list_response(res):
+        if not res.is_ok:
+            raise ValueError("Failed to list files, status code: {}".format(res.raw.status_code))
+
+    def _get_propfind_kwargs(self, uid, path=None, depth=1, all_properties=False):
+        """ Build requester.propfind arguments for listing files """
         additional_url = uid
         if path:
             additional_url = "{}/{}".format(additional_url, path)
-        resp = self.requester.propfind(additional_url=additional_url,
-                                       headers={"Depth": str(depth)},
-                                       data=data)
+        return dict(additional_url=additional_url,
+                    headers={"Depth": str(depth)},
+                    data=self.ALL_PROPERTIES_PROPFIND if all_properties else None)
+
+    def _get_files_response(self, resp):
+        """ Parse multistatus response data into list of files """
         if not resp.is_ok:
             resp.data = None
             return resp
-        response_data = resp.data
-        response_xml_data = ET.fromstring(response_data)
+        response_xml_data = ET.fromstring(resp.data)
         files_data = [File(single_file) for single_file in response_xml_data]
         resp.data = files_data if not self.json_output else [each.as_dict() for each in files_data]
         return resp
 
-    def download_file(self, uid, path):
+    def _get_file_property(self, file_data, property_name):
+        """ Get property of listed file, either dict or File object """
+        if self.json_output:
+            return file_data.get(property_name)
+        return getattr(file_data, property_name, None)
+
+    def download_file(self, uid, path, local_path=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
         """
         Download file of given user by path
-        File will be saved to working directory
+        File will be saved to working directory, or to local_path if it's given
         path argument must be valid file path
         Modified time of saved file will be synced with the file properties in Nextcloud
 
+        File is streamed to disk by chunks, so memory use doesn't depend on file size.
+
         Exception will be raised if:
             * path doesn't exist,
             * path is a directory, or if
-            * file with same name already exists in working directory
+            * file with same name already exists in working directory (or at local_path)
 
         Args:
             uid (str): uid of user
             path (str): file path
+            local_path (str/file object): (optional) path to save file to or binary file
+                object to write file contents to, mtime isn't synced for file object
+            chunk_size (int): size of chunks in bytes written at once
+
+        Returns:
+            None
+        """
+        file_data = self.list_folders(uid=uid, path=path, depth=0)
+        local_path = self._get_download_local_path(path, file_data, local_path)
+        res = self.requester.download("/".join([uid, path]), stream=True)
+        try:
+            self._check_download_response(res)
+            with self._open_download_local_path(local_path) as f:
+                for chunk in res.raw.iter_content(chunk_size):
+                    f.write(chunk)
+        finally:
+            res.raw.close()
+        self._sync_downloaded_file_mtime(local_path, file_data)
+
+    def iter_file_contents(self, uid, path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download file of given user by path as iterator over its contents
+
+        File is streamed by chunks, so memory use doesn't depend on file size.
+        Request is sent when iteration starts.
+
+        Args:
+            uid (str): uid of user
+            path (str): file path
+            chunk_size (int): size of yielded chunks in bytes
+
+        Returns:
+            iterator of bytes
+        """
+        res = self.requester.download("/".join([uid, path]), stream=True)
+        try:
+            self._check_download_response(res)
+            for chunk in res.raw.iter_content(chunk_size):
+                yield chunk
+        finally:
+            res.raw.close()
+
+    def download_folder_archive(self, uid, path, dest, archive_format="zip", extract=False,
+                                chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Download folder of given user by path as archive generated by Nextcloud
+
+        Whole folder is fetched in one request (needs Nextcloud 30 or later,
+        which serves archives of folders over WebDAV) and streamed by chunks,
+        so memory use doesn't depend on folder size.
+
+        If extract is True, archive is requested as tar and extracted to dest
+        directory while it's downloaded, modified times of files are restored.
+        Zip archives can't be extracted before they are downloaded completely,
+        because their index is at the end.
+
+        Exception will be raised if:
+            * path doesn't exist or isn't a folder,
+            * archive file with the same name already exists (at dest), or if
+            * archive member points outside of dest directory, when extracting
+
+        Args:
+            uid (str): uid of user
+            path (str): folder path
+            dest (str/file object): path to save archive to or binary file object to
+                write archive to, directory to extract archive to if extract is True
+            archive_format (str): "zip" or "tar", ignored if extract is True
+            extract (bool): extract archive to dest directory while downloading
+            chunk_size (int): size of chunks in bytes written at once
+
+        Returns:
+            None
+        """
+        res = self.requester.download(
+            **self._get_archive_download_kwargs(uid, path, dest, archive_format, extract))
+        try:
+            self._check_download_response(res)
+            chunks = res.raw.iter_content(chunk_size)
+            if extract:
+                self._extract_tar_stream(ChunksReader(chunks), dest)
+                return
+            with self._open_download_local_path(dest) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        finally:
+            res.raw.close()
+
+    def _get_archive_download_kwargs(self, uid, path, dest, archive_format, extract):
+        """ Check archive download arguments and build requester.download arguments """
+        if extract:
+            archive_format = "tar"
+            os.makedirs(dest, exist_ok=True)
+        elif not hasattr(dest, 'write') and os.path.exists(dest):
+            raise ValueError("File with such name already exists")
+        if archive_format not in self.ARCHIVE_CONTENT_TYPES:
+            raise ValueError("Unknown archive format: {}".format(archive_format))
+        return dict(url="/".join([uid, path.strip("/")]),
+                    headers={"Accept": self.ARCHIVE_CONTENT_TYPES[archive_format]},
+                    stream=True)
+
+    @staticmethod
+    def _extract_tar_stream(fileobj, dest):
+        """ Extract tar archive read from non seekable file object, keeping modified times """
+        dest = os.path.abspath(dest)
+
+        def checked_members(tar):
+            for member in tar:
+                member_path = os.path.abspath(os.path.join(dest, member.name))
+                is_outside = not (member_path + os.sep).startswith(dest + os.sep)
+                if is_outside or member.issym() or member.islnk():
+                    raise ValueError("Archive member outside of destination: {}"
+                                     .format(member.name))
+                yield member
+
+        with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+            kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+            tar.extractall(dest, members=checked_members(tar), **kwargs)
+
+    def download_file_parallel(self, uid, path, local_path=None, range_size=DOWNLOAD_RANGE_SIZE,
+                               max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Download big file of given user by path, fetching byte ranges of it concurrently
+
+        File size is taken from its properties, file is preallocated in
+        "<local_path>.part" and every range is written at its offset. Finished
+        ranges are recorded in "<local_path>.part.journal", so interrupted
+        download continues where it stopped, when called again. When all ranges
+        are fetched, partial file is renamed to local_path and its modified time
+        is synced with Nextcloud.
+
+        Exception will be raised in the same cases as by download_file, or if
+        server doesn't support range requests or file changed while downloading.
+
+        Args:
+            uid (str): uid of user
+            path (str): file path
+            local_path (str): (optional) path to save file to, by default file is
+                saved to working directory
+            range_size (int): size of ranges in bytes
+            max_workers (int): number of ranges fetched at once
 
         Returns:
             None
         """
-        additional_url = "/".join([uid, path])
-        filename = path.split('/')[-1] if '/' in path else path
         file_data = self.list_folders(uid=uid, path=path, depth=0)
-        if not file_data:
+        download = self._get_parallel_download(path, file_data, local_path, range_size)
+        additional_url = "/".join([uid, path])
+
+        def download_range(number):
+            res = self.requester.download(additional_url, stream=True,
+                                          headers=download.get_range_headers(number))
+            try:
+                self._check_range_response(res)
+                with download.open_range(number) as f:
+                    for chunk in res.raw.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            finally:
+                res.raw.close()
+            download.journal.add_chunk(number)
+
+        # every range is tried, so the next call has to fetch only the failed ones
+        download.raise_first_exception(
+            iter_concurrently(download_range, download.pending_ranges, max_workers))
+        download.finish()
+        self._sync_downloaded_file_mtime(download.local_path, file_data)
+
+    def _get_parallel_download(self, path, file_data, local_path, range_size):
+        """ Check that listed file can be downloaded by ranges and start (or resume) it """
+        local_path = self._get_download_local_path(path, file_data, local_path)
+        if hasattr(local_path, 'write'):
+            raise ValueError("Parallel download needs local path, not file object")
+        return ParallelDownload(
+            local_path, range_size,
+            size=int(self._get_file_property(file_data.data[0], 'content_length') or 0),
+            etag=self._get_file_property(file_data.data[0], 'etag'),
+            href=self._get_file_property(file_data.data[0], 'href'))
+
+    @classmethod
+    def _check_range_response(cls, res):
+        cls._check_download_response(res)
+        if res.raw.status_code != WebDAVStatusCodes.PARTIAL_CONTENT_CODE:
+            raise ValueError("File changed during download or server doesn't "
+                             "support range requests")
+
+    def _get_download_local_path(self, path, file_data, local_path=None):
+        """ Check that listed path can be downloaded and return local path to save it to """
+        if not file_data.data:
             raise ValueError("Given path doesn't exist")
-        file_resource_type = (file_data.data[0].get('resource_type')
-                              if self.json_output
-                              else file_data.data[0].resource_type)
+        file_resource_type = self._get_file_property(file_data.data[0], 'resource_type')
         if file_resource_type == File.COLLECTION_RESOURCE_TYPE:
             raise ValueError("This is a collection, please specify file path")
-        if filename in os.listdir('./'):
-            raise ValueError("File with such name already exists in this directory")
-        res = self.requester.download(additional_url)
-        with open(filename, 'wb') as f:
-            f.write(res.data)
+        if local_path is None:
+            local_path = path.split('/')[-1] if '/' in path else path
+            if local_path in os.listdir('./'):
+                raise ValueError("File with such name already exists in this directory")
+        elif not hasattr(local_path, 'write') and os.path.exists(local_path):
+            raise ValueError("File with such name already exists")
+        return local_path
 
+    @staticmethod
+    def _check_download_response(res):
+        if not res.is_ok:
+            raise ValueError("Failed to download file, status code: {}"
+                             .format(res.raw.status_code))
+
+    @staticmethod
+    def _open_download_local_path(local_path):
+        """ Open local path for writing, file object is used as is and not closed """
+        if hasattr(local_path, 'write'):
+            return _use_file_object(local_path)
+        return open(local_path, 'wb')
+
+    def _sync_downloaded_file_mtime(self, local_path, file_data):
+        """ Set mtime of downloaded file to its last modified time in Nextcloud """
+        if hasattr(local_path, 'write'):
+            return
         # get timestamp of downloaded file from file property on Nextcloud
         # If it succeeded, set the timestamp to saved local file
         # If the timestamp string is invalid or broken, the timestamp is downloaded time.
-        file_timestamp_str = (file_data.data[0].get('last_modified'))
+        file_timestamp_str = self._get_file_property(file_data.data[0], 'last_modified')
         file_timestamp = timestamp_to_epoch_time(file_timestamp_str)
         if isinstance(file_timestamp, int):
-            os.utime(filename, (datetime.now().timestamp(), file_timestamp))
+            os.utime(local_path, (datetime.now().timestamp(), file_timestamp))
 
     def upload_file(self, uid, local_filepath, remote_filepath, timestamp=None):
         """
@@ -122,13 +585,13 @@ class WebDAV(WithRequester):
             remote_filepath (str): path where to upload file on Nextcloud storage
             timestamp (int): timestamp of upload file. If None, get time by local file.
         """
-        with open(local_filepath, 'rb') as f:
-            file_contents = f.read()
         if timestamp is None:
             timestamp = int(os.path.getmtime(local_filepath))
-        return self.upload_file_contents(uid, file_contents, remote_filepath, timestamp)
+        with open(local_filepath, 'rb') as f:
+            return self.upload_stream(uid, f, remote_filepath, timestamp)
 
-    def upload_file_contents(self, uid, file_contents, remote_filepath, timestamp=None):
+    def upload_file_contents(self, uid, file_contents, remote_filepath, timestamp=None,
+                             checksum=None):
         """
         Upload file to Nextcloud storage
 
@@ -137,9 +600,144 @@ class WebDAV(WithRequester):
             file_contents (bytes): Bytes the file to be uploaded consists of
             remote_filepath (str): path where to upload file on Nextcloud storage
             timestamp (int):  mtime of upload file
+            checksum (str): (optional) checksum of file contents stored by Nextcloud,
+                "<algorithm>:<hex digest>", e.g. "SHA1:..."
         """
         additional_url = "/".join([uid, remote_filepath])
-        return self.requester.put_with_timestamp(additional_url, data=file_contents, timestamp=timestamp)
+        return self.requester.put_with_timestamp(additional_url, data=file_contents,
+                                                 timestamp=timestamp, checksum=checksum)
+
+    def upload_stream(self, uid, stream, remote_filepath, timestamp=None, checksum=None):
+        """
+        Upload file to Nextcloud storage from binary file object or iterable of bytes
+
+        Contents are sent as they are read, so memory use doesn't depend on file size.
+        Iterables are sent with chunked transfer encoding.
+
+        Args:
+            uid (str): uid of user
+            stream (file object/iterable): binary file object or iterable of bytes
+            remote_filepath (str): path where to upload file on Nextcloud storage
+            timestamp (int):  mtime of upload file
+            checksum (str): (optional) checksum of file contents stored by Nextcloud,
+                "<algorithm>:<hex digest>", e.g. "SHA1:..."
+        """
+        additional_url = "/".join([uid, remote_filepath])
+        return self.requester.put_with_timestamp(additional_url, data=stream,
+                                                 timestamp=timestamp, checksum=checksum)
+
+    def upload_file_if_changed(self, uid, local_filepath, remote_filepath, timestamp=None,
+                               algorithm=CHECKSUM_ALGORITHM):
+        """
+        Upload file to Nextcloud storage, unless remote file has the same contents
+
+        Checksum of local file is compared with checksums stored by Nextcloud
+        for remote file (oc:checksums), file is uploaded with its checksum in
+        OC-Checksum header, so the next call can skip it. Checksum is computed
+        in one pass over the file, files up to CHECKSUM_IN_MEMORY_SIZE are
+        uploaded from memory without reading them again.
+
+        Args:
+            uid (str): uid of user
+            local_filepath (str): path to file on local storage
+            remote_filepath (str): path where to upload file on Nextcloud storage
+            timestamp (int): timestamp of upload file. If None, get time by local file.
+            algorithm (str): checksum algorithm, "SHA1", "MD5" or "SHA256"
+
+        Returns:
+            WebDAVResponse of upload, None if file was skipped
+        """
+        if timestamp is None:
+            timestamp = int(os.path.getmtime(local_filepath))
+        checksum, file_contents = self._read_file_checksum(local_filepath, algorithm)
+        res = self.requester.propfind(**self._get_checksums_propfind_kwargs(uid, remote_filepath))
+        if self._has_checksum(self._get_files_response(res), checksum):
+            return None
+        if file_contents is not None:
+            return self.upload_file_contents(uid, file_contents, remote_filepath, timestamp,
+                                             checksum=checksum)
+        with open(local_filepath, 'rb') as f:
+            return self.upload_stream(uid, f, remote_filepath, timestamp, checksum=checksum)
+
+    @staticmethod
+    def _read_file_checksum(local_filepath, algorithm):
+        """
+        Compute checksum of local file in one pass
+
+        Returns:
+            checksum ("<algorithm>:<hex digest>") and file contents, if file is
+            small enough to keep in memory, None otherwise
+        """
+        file_hash = hashlib.new(algorithm.lower())
+        keep_contents = os.path.getsize(local_filepath) <= CHECKSUM_IN_MEMORY_SIZE
+        chunks = []
+        with open(local_filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+                if keep_contents:
+                    chunks.append(chunk)
+        checksum = "{}:{}".format(algorithm.upper(), file_hash.hexdigest())
+        return checksum, b"".join(chunks) if keep_contents else None
+
+    def _get_checksums_propfind_kwargs(self, uid, path):
+        """ Build requester.propfind arguments for getting checksums of file """
+        return dict(self._get_propfind_kwargs(uid, path, depth=0), data=self.CHECKSUMS_PROPFIND)
+
+    def _has_checksum(self, res, checksum):
+        """ Check if listed file has given checksum among checksums stored by Nextcloud """
+        if not res.is_ok or not res.data:
+            return False
+        check_sums = self._get_file_property(res.data[0], 'check_sums') or ""
+        return checksum.lower() in check_sums.lower().split()
+
+    def upload_file_chunked(self, uid, local_filepath, remote_filepath, timestamp=None,
+                            chunk_size=UPLOAD_CHUNK_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                            journal_path=None):
+        """
+        Upload big file to Nextcloud storage by chunks (Nextcloud chunked upload v2)
+
+        Chunks are uploaded concurrently to a transfer collection in uploads
+        of the user, then the file is assembled at remote_filepath with MOVE.
+        If journal_path is given, uploaded chunks are recorded in it, so upload
+        interrupted by a crash continues where it stopped, when called again
+        with the same arguments.
+
+        Args:
+            uid (str): uid of user
+            local_filepath (str): path to file on local storage
+            remote_filepath (str): path where to upload file on Nextcloud storage
+            timestamp (int): timestamp of upload file. If None, get time by local file.
+            chunk_size (int): size of chunks in bytes, at most 10000 chunks are allowed
+            max_workers (int): number of chunks uploaded at once
+            journal_path (str): (optional) local path of upload journal, it's removed
+                when upload is finished
+
+        Returns:
+            WebDAVResponse of assembling MOVE request, or of first failed request
+        """
+        upload = ChunkedUpload(uid, local_filepath, timestamp, chunk_size, journal_path,
+                               self.requester.get_full_url("/".join([uid, remote_filepath])))
+        res = self._uploads_requester.make_collection(**upload.get_make_collection_kwargs())
+        if not upload.is_transfer_collection_ready(res):
+            return res
+
+        def upload_chunk(number):
+            chunk_res = self._uploads_requester.put_chunk(**upload.get_put_chunk_kwargs(number))
+            if chunk_res.is_ok:
+                upload.journal.add_chunk(number)
+            return chunk_res
+
+        # every chunk is tried, so the next call has to upload only the failed ones
+        outcomes = sorted(iter_concurrently(upload_chunk, upload.pending_chunks, max_workers),
+                          key=lambda outcome: outcome[0])
+        failed = upload.get_first_failure([outcome[1:] for outcome in outcomes])
+        if failed is not None:
+            return failed
+
+        res = self._uploads_requester.move(**upload.get_move_kwargs())
+        if res.is_ok:
+            upload.journal.remove()
+        return res
 
     def create_folder(self, uid, folder_path):
         """
@@ -159,24 +757,218 @@ class WebDAV(WithRequester):
             folder_path (str): folder path
         Returns:
         """
-        self.create_folder(uid, folder_path)
+        if (uid, folder_path.strip("/")) not in self._known_folders:
+            self._remember_created_folder(uid, folder_path, self.create_folder(uid, folder_path))
         return True
 
     def assure_tree_exists(self, uid, tree_path):
         """
         Make sure that the folder structure on Nextcloud storage exists
+
+        Folders known to exist are remembered by client (up to
+        KNOWN_FOLDERS_CACHE_SIZE of them), so repeated calls cost no requests.
+        Otherwise the deepest existing folder of the tree is found by binary
+        search with Depth: 0 PROPFIND requests, and only folders under it are
+        created.
+
+        Args:
+            uid (str): uid of user
+            tree_path (str): The folder tree
+        Returns:
+            bool: False if creation of some folder failed
+        """
+        folders = self._get_tree_folders(tree_path)
+        known_count = self._known_folders.get_known_count(uid, folders)
+        # folders are checked from deepest known one, existing folder's parents exist too,
+        # the last unknown folder is just created, it may already exist
+        low, high = known_count, len(folders)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.requester.propfind(**self._get_propfind_kwargs(uid, folders[middle],
+                                                                   depth=0)).is_ok:
+                low = middle + 1
+            else:
+                high = middle
+        for folder in folders[low:]:
+            if not self._remember_created_folder(uid, folder, self.create_folder(uid, folder)):
+                return False
+        for folder in folders:
+            self._known_folders.add(uid, folder)
+        return True
+
+    def upload_files(self, uid, files, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Upload files to Nextcloud storage concurrently, creating their folders
+
+        Every distinct folder of uploaded files is created once, before
+        uploads start.
+
+        Args:
+            uid (str): uid of user
+            files (iterable): (local_filepath, remote_filepath) or
+                (local_filepath, remote_filepath, timestamp) tuples
+            max_workers (int): number of files uploaded at once
+
+        Returns:
+            list of WebDAVResponse, in order of files
+        """
+        files = [tuple(each) for each in files]
+        self._assure_parent_folders_exist(uid, [each[1] for each in files])
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda each: self.upload_file(uid, *each), files))
+
+    def bulk_upload(self, uid, files, batch_size=BULK_UPLOAD_BATCH_SIZE,
+                    max_files=BULK_UPLOAD_MAX_FILES, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Upload many small files with few requests, using Nextcloud bulk upload
+
+        Files are packed into multipart requests to /remote.php/dav/bulk, each
+        with at most max_files files of at most batch_size bytes in total.
+        Files bigger than batch_size are uploaded with separate PUT requests,
+        as are all files if server capabilities don't advertise bulk upload.
+        Up to max_workers requests are sent at once. Folders of uploaded files
+        are created before uploads start.
+
         Args:
             uid (str): uid of user
-            folder_path (str): The folder tree
+            files (iterable): (local_filepath or bytes, remote_filepath) or
+                (local_filepath or bytes, remote_filepath, timestamp) tuples,
+                timestamp of local file is its mtime by default
+            batch_size (int): maximum size of files in one request in bytes
+            max_files (int): maximum number of files in one request
+            max_workers (int): number of requests sent at once
+
         Returns:
+            list of BulkUploadResult, in order of files
         """
-        tree = pathlib.PurePath(tree_path)
-        parents = list(tree.parents)
-        ret = True
-        subfolders = parents[:-1][::-1] + [tree]
-        for subf in subfolders:
-            ret = self.assure_folder_exists(uid, str(subf))
-        return ret
+        files = [BulkUploadFile(*each) for each in files]
+        self._assure_parent_folders_exist(uid, [each.remote_filepath for each in files])
+
+        if self._is_bulk_upload_supported():
+            batches = self._get_bulk_upload_batches(files, batch_size, max_files)
+        else:
+            batches = [[each] for each in files]
+
+        results = {}
+        for batch, batch_results, exception in iter_concurrently(
+                lambda batch: self._upload_batch(uid, batch), batches, max_workers):
+            if exception is not None:
+                batch_results = [BulkUploadResult(each.remote_filepath, False,
+                                                  message=str(exception)) for each in batch]
+            for each, result in zip(batch, batch_results):
+                results[id(each)] = result
+        return [results[id(each)] for each in files]
+
+    def _is_bulk_upload_supported(self):
+        """ Check server capabilities for bulk upload, result is remembered """
+        if self._bulk_upload_supported is None:
+            res = self._capabilities_requester.get(params={"format": "json"})
+            self._bulk_upload_supported = self._get_bulk_upload_support(res)
+        return self._bulk_upload_supported
+
+    @staticmethod
+    def _get_bulk_upload_support(res):
+        try:
+            capabilities = json.loads(res.data)['ocs']['data']['capabilities']
+        except (ValueError, KeyError, TypeError):
+            capabilities = {}
+        return bool(capabilities.get('dav', {}).get('bulkupload'))
+
+    @staticmethod
+    def _get_bulk_upload_batches(files, batch_size, max_files):
+        """ Split files into batches, files bigger than batch_size are put into own batch """
+        batches, batch, total_size = [], [], 0
+        for each in files:
+            if each.size > batch_size:
+                batches.append([each])
+                continue
+            if batch and (total_size + each.size > batch_size or len(batch) >= max_files):
+                batches.append(batch)
+                batch, total_size = [], 0
+            batch.append(each)
+            total_size += each.size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _upload_batch(self, uid, batch):
+        """ Upload batch of files, single file is uploaded with PUT, return list of results """
+        if len(batch) == 1:
+            each = batch[0]
+            if isinstance(each.source, bytes):
+                res = self.upload_file_contents(uid, each.source, each.remote_filepath,
+                                                each.timestamp)
+            else:
+                res = self.upload_file(uid, each.source, each.remote_filepath, each.timestamp)
+            return [self._get_single_upload_result(each, res)]
+        res = self._dav_requester.post_data(**self._get_bulk_upload_kwargs(batch))
+        return self._get_bulk_upload_results(batch, res)
+
+    @staticmethod
+    def _get_single_upload_result(each, res):
+        return BulkUploadResult(each.remote_filepath, res.is_ok,
+                                etag=res.raw.headers.get('ETag'), response=res)
+
+    @staticmethod
+    def _get_bulk_upload_kwargs(batch):
+        """ Get post_data kwargs of multipart bulk upload request of batch of files """
+        boundary = "boundary_{}".format(uuid.uuid4().hex)
+        body = []
+        for each in batch:
+            contents = each.read()
+            body.append("--{}\r\n".format(boundary).encode())
+            body.append("".join("{}: {}\r\n".format(name, value) for name, value in [
+                ("X-File-Path", "/" + each.remote_filepath.lstrip("/")),
+                ("X-File-MD5", hashlib.md5(contents).hexdigest()),
+                ("X-File-Mtime", "{:.0f}".format(each.timestamp)),
+                ("Content-Length", len(contents)),
+            ]).encode('utf-8'))
+            body.extend([b"\r\n", contents, b"\r\n"])
+        body.append("--{}--\r\n".format(boundary).encode())
+        headers = {"Content-Type": "multipart/related; boundary={}".format(boundary)}
+        return dict(additional_url="bulk", data=b"".join(body), headers=headers)
+
+    @staticmethod
+    def _get_bulk_upload_results(batch, res):
+        """ Get result of every file of batch from response of bulk upload request """
+        if not res.is_ok:
+            message = "Bulk upload failed, status code: {}".format(res.raw.status_code)
+            return [BulkUploadResult(each.remote_filepath, False, message=message, response=res)
+                    for each in batch]
+        files_data = json.loads(res.data)
+        results = []
+        for each in batch:
+            file_data = files_data.get("/" + each.remote_filepath.lstrip("/"), {})
+            results.append(BulkUploadResult(
+                each.remote_filepath, file_data.get('error') is False,
+                etag=file_data.get('etag'), file_id=file_data.get('fileid'),
+                message=file_data.get('message'), response=res))
+        return results
+
+    def _assure_parent_folders_exist(self, uid, remote_paths):
+        """ Make sure that folders of given remote paths exist, every folder is checked once """
+        for folder in self._get_deepest_folders(remote_paths):
+            self.assure_tree_exists(uid, folder)
+
+    @staticmethod
+    def _get_deepest_folders(remote_paths):
+        """ Get distinct parent folders of paths, without folders which are parents of others """
+        folders = {path.strip("/").rpartition("/")[0] for path in remote_paths} - {""}
+        parents = {folder.rpartition("/")[0] for folder in folders}
+        return sorted(folders - parents)
+
+    @staticmethod
+    def _get_tree_folders(tree_path):
+        """ Get paths of all folders of tree from top to bottom, e.g. ["a", "a/b", "a/b/c"] """
+        names = [name for name in str(tree_path).split("/") if name]
+        return ["/".join(names[:count]) for count in range(1, len(names) + 1)]
+
+    def _remember_created_folder(self, uid, folder_path, res):
+        """ Remember folder if it was created or already existed, return if it exists """
+        if res.is_ok or res.raw.status_code == WebDAVStatusCodes.ALREADY_EXISTS_CODE:
+            self._known_folders.add(uid, folder_path.strip("/"))
+            return True
+        return False
 
     def delete_path(self, uid, path):
         """
@@ -187,6 +979,7 @@ class WebDAV(WithRequester):
             path (str): file or folder path to delete
         """
         url = "/".join([uid, path])
+        self._known_folders.discard_tree(uid, path)
         return self.requester.delete(url=url)
 
     def move_path(self, uid, path, destination_path, overwrite=False):
@@ -201,6 +994,9 @@ class WebDAV(WithRequester):
         """
         path_url = "/".join([uid, path])
         destination_path_url = "/".join([uid, destination_path])
+        self._known_folders.discard_tree(uid, path)
+        if overwrite:
+            self._known_folders.discard_tree(uid, destination_path)
         return self.requester.move(url=path_url,
                                    destination=destination_path_url, overwrite=overwrite)
 
@@ -219,6 +1015,252 @@ class WebDAV(WithRequester):
         return self.requester.copy(url=path_url,
                                    destination=destination_path_url, overwrite=overwrite)
 
+    def changes_since(self, uid, path=None, sync_token=None, infinite=True, limit=None):
+        """
+        Get files changed since given sync token with sync-collection REPORT (RFC 6578)
+
+        Without sync token all files are returned. Added and modified files
+        are not distinguished by protocol, both are returned as changed.
+        Returned sync token should be persisted and passed to next call. If
+        server returned only part of changes (e.g. because of limit), response
+        data "truncated" is True and the call should be repeated with returned
+        sync token. Response is not ok, if server doesn't support sync
+        collection or sync token is no longer valid, then files should be
+        listed again from scratch, without sync token.
+
+        Args:
+            uid (str): uid of user
+            path (str/None): folder path
+            sync_token (str/None): sync token returned by previous call
+            infinite (bool): include changes of whole tree, not only direct
+                children of folder
+            limit (int): (optional) maximum number of returned changes
+
+        Returns:
+            response with data dict:
+                sync_token: new sync token
+                changed: list of dicts if json_output, list of File objects if not json_output
+                removed: list of hrefs of removed files
+                truncated: bool
+        """
+        return self._get_changes_response(
+            self.requester.report(**self._get_sync_collection_kwargs(uid, path, sync_token,
+                                                                      infinite, limit)))
+
+    def _get_sync_collection_kwargs(self, uid, path, sync_token, infinite, limit):
+        """ Build requester.report arguments for sync-collection report """
+        additional_url = uid
+        if path:
+            additional_url = "{}/{}".format(additional_url, path)
+        data = self.SYNC_COLLECTION_REPORT.format(
+            sync_token=escape(sync_token or ""),
+            sync_level="infinite" if infinite else "1",
+            limit=self.SYNC_COLLECTION_LIMIT.format(int(limit)) if limit else "")
+        return dict(additional_url=additional_url, headers={"Depth": "0"}, data=data)
+
+    def _get_changes_response(self, resp):
+        """ Parse sync-collection response data into changed files, removed hrefs and sync token """
+        if not resp.is_ok:
+            resp.data = None
+            return resp
+        response_xml_data = ET.fromstring(resp.data)
+        changed, removed, truncated = [], [], False
+        for single_file in response_xml_data.iter(MultistatusParser.RESPONSE_TAG):
+            status = single_file.find(File.STATUS_TAG)
+            if status is None:
+                changed.append(File(single_file))
+            elif " {} ".format(WebDAVStatusCodes.NOT_FOUND_CODE) in status.text:
+                removed.append(single_file.find(File.HREF_TAG).text)
+            elif " {} ".format(WebDAVStatusCodes.INSUFFICIENT_STORAGE_CODE) in status.text:
+                # RFC 6578: request url with 507 status means that changes were truncated
+                truncated = True
+        resp.data = {
+            "sync_token": response_xml_data.findtext(self.SYNC_TOKEN_TAG),
+            "changed": changed if not self.json_output else [each.as_dict() for each in changed],
+            "removed": removed,
+            "truncated": truncated,
+        }
+        return resp
+
+    def search_files(self, uid, scope=None, where=None, order_by=None, limit=None,
+                     page_size=SEARCH_PAGE_SIZE):
+        """
+        Search files of given user with DAV SEARCH, filtering and ordering is done by server
+
+        Conditions of where are (property, operator, value) tuples, which all
+        have to match, e.g. [("getcontenttype", "like", "image/%"), ("size", "gt", 1024)].
+        Properties are Nextcloud property names (like keys of File.FILE_PROPERTIES),
+        operators are "eq", "lt", "lte", "gt", "gte" and "like" ("%" is wildcard),
+        datetime values are compared as timestamps. Instead of list of conditions,
+        where can be raw basicsearch where clause XML.
+
+        Results are requested by pages of page_size files, next page is
+        requested when previous one is iterated over.
+
+        Args:
+            uid (str): uid of user
+            scope (str/None): path of folder to search in, user root by default
+            where (list/str): (optional) conditions, all files are found without them
+            order_by (str/list): (optional) property name or list of property names,
+                prefixed with "-" for descending order
+            limit (int): (optional) maximum number of found files
+            page_size (int): number of files requested at once
+
+        Returns:
+            iterator of dicts if json_output
+            iterator of File objects if not json_output
+        """
+        offset = 0
+        while limit is None or offset < limit:
+            page_limit = page_size if limit is None else min(page_size, limit - offset)
+            data = self._get_search_request(uid, scope, where, order_by, page_limit, offset)
+            res = self._dav_requester.search("/", data=data)
+            files = self._get_search_files(res)
+            for file_data in files:
+                yield file_data
+            if len(files) < page_limit:
+                break
+            offset += len(files)
+
+    def _get_search_request(self, uid, scope, where, order_by, limit, offset):
+        """ Build basicsearch request body """
+        scope = "/".join(["/files", uid, scope.strip("/")] if scope else ["/files", uid])
+        if where is None:
+            where = ""
+        elif not isinstance(where, str):
+            conditions = [self._get_search_condition(*condition) for condition in where]
+            where = "".join(conditions)
+            if len(conditions) > 1:
+                where = "<d:and>{}</d:and>".format(where)
+        if where:
+            where = "<d:where>{}</d:where>".format(where)
+        if isinstance(order_by, str):
+            order_by = [order_by]
+        order_by = "".join(
+            "<d:order><d:prop>{}</d:prop><d:{}/></d:order>".format(
+                self._get_search_property(prop.lstrip("-")),
+                "descending" if prop.startswith("-") else "ascending")
+            for prop in order_by or [])
+        if order_by:
+            order_by = "<d:orderby>{}</d:orderby>".format(order_by)
+        return self.SEARCH_REQUEST.format(scope=escape(scope), where=where, order_by=order_by,
+                                          limit=limit, offset=offset)
+
+    def _get_search_condition(self, property_name, operator, value):
+        """ Build basicsearch comparison of property with value """
+        if operator not in self.SEARCH_OPERATORS:
+            raise ValueError("Unknown search operator: {}".format(operator))
+        if isinstance(value, datetime):
+            value = int(value.timestamp())
+        return "<d:{operator}><d:prop>{prop}</d:prop><d:literal>{value}</d:literal></d:{operator}>" \
+            .format(operator=operator, prop=self._get_search_property(property_name),
+                    value=escape(str(value)))
+
+    def _get_search_property(self, property_name):
+        """ Get property element for Nextcloud property name """
+        if property_name not in self.SEARCH_PROPERTIES:
+            raise ValueError("Unknown search property: {}".format(property_name))
+        return "<{}:{} />".format(self.SEARCH_PROPERTIES[property_name], property_name)
+
+    def _get_search_files(self, res):
+        """ Parse search response page into list of files, raise if search failed """
+        if not res.is_ok:
+            raise ValueError("Failed to search files, status code: {}".format(res.raw.status_code))
+        files_data = [File(single_file) for single_file in ET.fromstring(res.data)]
+        return files_data if not self.json_output else [each.as_dict() for each in files_data]
+
+    def delete_paths(self, uid, paths, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Delete files or folders of given user concurrently
+
+        Paths under other deleted folder are not deleted separately, they get
+        response of deleting the folder. Failure of one path doesn't stop the
+        others, its exception is yielded instead of response.
+
+        Args:
+            uid (str): uid of user
+            paths (iterable): file or folder paths to delete
+            max_workers (int): number of paths deleted at once
+
+        Returns:
+            iterator of (path, WebDAVResponse, exception) tuples, in order of
+            finished requests, response is None if exception was raised
+        """
+        deleted_paths, covered_paths = self._collapse_deleted_paths(paths)
+        for path, res, exception in iter_concurrently(
+                lambda path: self.delete_path(uid, path), deleted_paths, max_workers):
+            yield path, res, exception
+            for covered_path in covered_paths.get(path, []):
+                yield covered_path, res, exception
+
+    def move_paths(self, uid, paths, overwrite=False, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Move files or folders of given user concurrently
+
+        Failure of one path doesn't stop the others, its exception is yielded
+        instead of response.
+
+        Args:
+            uid (str): uid of user
+            paths (iterable): (path, destination_path) tuples
+            overwrite (bool): allow destination paths overriding
+            max_workers (int): number of paths moved at once
+
+        Returns:
+            iterator of (path, destination_path, WebDAVResponse, exception) tuples,
+            in order of finished requests, response is None if exception was raised
+        """
+        for (path, destination_path), res, exception in iter_concurrently(
+                lambda each: self.move_path(uid, *each, overwrite=overwrite), paths, max_workers):
+            yield path, destination_path, res, exception
+
+    def copy_paths(self, uid, paths, overwrite=False, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Copy files or folders of given user concurrently
+
+        Failure of one path doesn't stop the others, its exception is yielded
+        instead of response.
+
+        Args:
+            uid (str): uid of user
+            paths (iterable): (path, destination_path) tuples
+            overwrite (bool): allow destination paths overriding
+            max_workers (int): number of paths copied at once
+
+        Returns:
+            iterator of (path, destination_path, WebDAVResponse, exception) tuples,
+            in order of finished requests, response is None if exception was raised
+        """
+        for (path, destination_path), res, exception in iter_concurrently(
+                lambda each: self.copy_path(uid, *each, overwrite=overwrite), paths, max_workers):
+            yield path, destination_path, res, exception
+
+    @staticmethod
+    def _collapse_deleted_paths(paths):
+        """
+        Split deleted paths into paths to delete and paths under them or same as them
+
+        Returns:
+            list of paths to delete, dict of lists of paths covered by deleted path
+        """
+        # every spelling of the same path, e.g. "a" and "/a/", gets its outcome
+        normalized_paths = {}
+        for path in paths:
+            normalized_paths.setdefault(path.strip("/"), []).append(path)
+        deleted_paths, covered_paths = [], {}
+        for normalized_path in sorted(normalized_paths):
+            path, *same_paths = normalized_paths[normalized_path]
+            names = normalized_path.split("/")
+            for count in range(1, len(names)):
+                parent = normalized_paths.get("/".join(names[:count]), [None])[0]
+                if parent in covered_paths:
+                    covered_paths[parent].extend([path] + same_paths)
+                    break
+            else:
+                deleted_paths.append(path)
+                covered_paths[path] = same_paths
+        return deleted_paths, covered_paths
+
     def set_favorites(self, uid, path):
         """
         Set files of a user favorite
@@ -247,25 +1289,598 @@ class WebDAV(WithRequester):
             uid (str): uid of user
             path (str): file or folder path to make favorite
         """
-        data = """<?xml version="1.0"?>
-        <oc:filter-files xmlns:d="DAV:"
-                         xmlns:oc="http://owncloud.org/ns"
-                         xmlns:nc="http://nextcloud.org/ns">
-                 <oc:filter-rules>
-                         <oc:favorite>1</oc:favorite>
-                 </oc:filter-rules>
-         </oc:filter-files>
-        """
         url = "/".join([uid, path])
-        res = self.requester.report(additional_url=url, data=data)
-        if not res.is_ok:
-            res.data = None
+        res = self.requester.report(additional_url=url, data=self.FAVORITES_REPORT)
+        return self._get_files_response(res)
+
+
+class AsyncWebDAV(WebDAV):
+    """
+    WebDAV API wrapper for AsyncNextCloud
+
+    Methods which only send a request are inherited and return coroutines,
+    methods which post-process responses are overridden.
+    """
+
+    async def list_folders(self, uid, path=None, depth=1, all_properties=False):
+        resp = await self.requester.propfind(
+            **self._get_propfind_kwargs(uid, path, depth, all_properties))
+        return self._get_files_response(resp)
+
+    async def iter_folder(self, uid, path=None, depth=1, all_properties=False,
+                          chunk_size=DOWNLOAD_CHUNK_SIZE):
+        res = await self.requester.propfind(
+            stream=True, **self._get_propfind_kwargs(uid, path, depth, all_properties))
+        try:
+            self._check_list_response(res)
+            parser = MultistatusParser()
+            async for chunk in res.raw.aiter_bytes(chunk_size):
+                for file_data in parser.feed(chunk):
+                    yield file_data.as_dict() if self.json_output else file_data
+            for file_data in parser.close():
+                yield file_data.as_dict() if self.json_output else file_data
+        finally:
+            await res.raw.aclose()
+
+    async def walk(self, uid, path=None, all_properties=False, max_workers=DEFAULT_MAX_WORKERS,
+                   onerror=None):
+        async def list_folder(folder_path):
+            return [file_data async for file_data
+                    in self.iter_folder(uid, folder_path, all_properties=all_properties)]
+
+        pending = [(path or "").strip("/")]
+        in_flight = {}
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max_workers:
+                    folder_path = pending.pop()
+                    in_flight[asyncio.ensure_future(list_folder(folder_path))] = folder_path
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    folder_path = in_flight.pop(future)
+                    try:
+                        files_data = future.result()
+                    except Exception as e:
+                        if onerror is None:
+                            raise
+                        onerror(e)
+                        continue
+                    dirs, files = self._split_folder_listing(uid, folder_path, files_data)
+                    yield folder_path, dirs, files
+                    pending.extend(self._get_folder_paths(uid, dirs))
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    async def download_file(self, uid, path, local_path=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        file_data = await self.list_folders(uid=uid, path=path, depth=0)
+        local_path = self._get_download_local_path(path, file_data, local_path)
+        res = await self.requester.download("/".join([uid, path]), stream=True)
+        try:
+            self._check_download_response(res)
+            with self._open_download_local_path(local_path) as f:
+                async for chunk in res.raw.aiter_bytes(chunk_size):
+                    f.write(chunk)
+        finally:
+            await res.raw.aclose()
+        self._sync_downloaded_file_mtime(local_path, file_data)
+
+    async def iter_file_contents(self, uid, path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        res = await self.requester.download("/".join([uid, path]), stream=True)
+        try:
+            self._check_download_response(res)
+            async for chunk in res.raw.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await res.raw.aclose()
+
+    async def download_folder_archive(self, uid, path, dest, archive_format="zip", extract=False,
+                                      chunk_size=DOWNLOAD_CHUNK_SIZE):
+        res = await self.requester.download(
+            **self._get_archive_download_kwargs(uid, path, dest, archive_format, extract))
+        try:
+            self._check_download_response(res)
+            chunks = res.raw.aiter_bytes(chunk_size)
+            if extract:
+                # tarfile reads synchronously, so extraction runs in thread, pulling
+                # chunks from event loop as it needs them
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, self._extract_tar_stream,
+                                           ChunksReader(_iter_async_chunks(chunks, loop)), dest)
+                return
+            with self._open_download_local_path(dest) as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+        finally:
+            await res.raw.aclose()
+
+    async def download_file_parallel(self, uid, path, local_path=None,
+                                     range_size=DOWNLOAD_RANGE_SIZE,
+                                     max_workers=DEFAULT_MAX_WORKERS):
+        file_data = await self.list_folders(uid=uid, path=path, depth=0)
+        download = self._get_parallel_download(path, file_data, local_path, range_size)
+        additional_url = "/".join([uid, path])
+
+        async def download_range(number):
+            res = await self.requester.download(additional_url, stream=True,
+                                                headers=download.get_range_headers(number))
+            try:
+                self._check_range_response(res)
+                with download.open_range(number) as f:
+                    async for chunk in res.raw.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            finally:
+                await res.raw.aclose()
+            download.journal.add_chunk(number)
+
+        download.raise_first_exception(
+            [outcome async for outcome in aiter_concurrently(download_range,
+                                                             download.pending_ranges,
+                                                             max_workers)])
+        download.finish()
+        self._sync_downloaded_file_mtime(download.local_path, file_data)
+
+    async def upload_file(self, uid, local_filepath, remote_filepath, timestamp=None):
+        if timestamp is None:
+            timestamp = int(os.path.getmtime(local_filepath))
+        with open(local_filepath, 'rb') as f:
+            return await self.upload_stream(uid, f, remote_filepath, timestamp)
+
+    async def upload_file_if_changed(self, uid, local_filepath, remote_filepath, timestamp=None,
+                                     algorithm=CHECKSUM_ALGORITHM):
+        if timestamp is None:
+            timestamp = int(os.path.getmtime(local_filepath))
+        checksum, file_contents = self._read_file_checksum(local_filepath, algorithm)
+        res = await self.requester.propfind(
+            **self._get_checksums_propfind_kwargs(uid, remote_filepath))
+        if self._has_checksum(self._get_files_response(res), checksum):
+            return None
+        if file_contents is not None:
+            return await self.upload_file_contents(uid, file_contents, remote_filepath, timestamp,
+                                                   checksum=checksum)
+        with open(local_filepath, 'rb') as f:
+            return await self.upload_stream(uid, f, remote_filepath, timestamp, checksum=checksum)
+
+    async def assure_folder_exists(self, uid, folder_path):
+        if (uid, folder_path.strip("/")) not in self._known_folders:
+            self._remember_created_folder(uid, folder_path,
+                                          await self.create_folder(uid, folder_path))
+        return True
+
+    async def assure_tree_exists(self, uid, tree_path):
+        folders = self._get_tree_folders(tree_path)
+        known_count = self._known_folders.get_known_count(uid, folders)
+        low, high = known_count, len(folders)
+        while high - low > 1:
+            middle = (low + high) // 2
+            res = await self.requester.propfind(**self._get_propfind_kwargs(uid, folders[middle],
+                                                                            depth=0))
+            if res.is_ok:
+                low = middle + 1
+            else:
+                high = middle
+        for folder in folders[low:]:
+            if not self._remember_created_folder(uid, folder, await self.create_folder(uid, folder)):
+                return False
+        for folder in folders:
+            self._known_folders.add(uid, folder)
+        return True
+
+    async def upload_files(self, uid, files, max_workers=DEFAULT_MAX_WORKERS):
+        files = [tuple(each) for each in files]
+        await self._assure_parent_folders_exist(uid, [each[1] for each in files])
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def upload(each):
+            async with semaphore:
+                return await self.upload_file(uid, *each)
+        return list(await asyncio.gather(*[upload(each) for each in files]))
+
+    async def bulk_upload(self, uid, files, batch_size=BULK_UPLOAD_BATCH_SIZE,
+                          max_files=BULK_UPLOAD_MAX_FILES, max_workers=DEFAULT_MAX_WORKERS):
+        files = [BulkUploadFile(*each) for each in files]
+        await self._assure_parent_folders_exist(uid, [each.remote_filepath for each in files])
+
+        if await self._is_bulk_upload_supported():
+            batches = self._get_bulk_upload_batches(files, batch_size, max_files)
+        else:
+            batches = [[each] for each in files]
+
+        results = {}
+        async for batch, batch_results, exception in aiter_concurrently(
+                lambda batch: self._upload_batch(uid, batch), batches, max_workers):
+            if exception is not None:
+                batch_results = [BulkUploadResult(each.remote_filepath, False,
+                                                  message=str(exception)) for each in batch]
+            for each, result in zip(batch, batch_results):
+                results[id(each)] = result
+        return [results[id(each)] for each in files]
+
+    async def _is_bulk_upload_supported(self):
+        if self._bulk_upload_supported is None:
+            res = await self._capabilities_requester.get(params={"format": "json"})
+            self._bulk_upload_supported = self._get_bulk_upload_support(res)
+        return self._bulk_upload_supported
+
+    async def _upload_batch(self, uid, batch):
+        if len(batch) == 1:
+            each = batch[0]
+            if isinstance(each.source, bytes):
+                res = await self.upload_file_contents(uid, each.source, each.remote_filepath,
+                                                      each.timestamp)
+            else:
+                res = await self.upload_file(uid, each.source, each.remote_filepath,
+                                             each.timestamp)
+            return [self._get_single_upload_result(each, res)]
+        res = await self._dav_requester.post_data(**self._get_bulk_upload_kwargs(batch))
+        return self._get_bulk_upload_results(batch, res)
+
+    async def _assure_parent_folders_exist(self, uid, remote_paths):
+        for folder in self._get_deepest_folders(remote_paths):
+            await self.assure_tree_exists(uid, folder)
+
+    async def upload_file_chunked(self, uid, local_filepath, remote_filepath, timestamp=None,
+                                  chunk_size=UPLOAD_CHUNK_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                                  journal_path=None):
+        upload = ChunkedUpload(uid, local_filepath, timestamp, chunk_size, journal_path,
+                               self.requester.get_full_url("/".join([uid, remote_filepath])))
+        res = await self._uploads_requester.make_collection(**upload.get_make_collection_kwargs())
+        if not upload.is_transfer_collection_ready(res):
             return res
-        response_xml_data = ET.fromstring(res.data)
-        files_data = [File(single_file) for single_file in response_xml_data]
-        res.data = files_data if not self.json_output else [each.as_dict() for each in files_data]
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def upload_chunk(number):
+            async with semaphore:
+                chunk_res = await self._uploads_requester.put_chunk(
+                    **upload.get_put_chunk_kwargs(number))
+            if chunk_res.is_ok:
+                upload.journal.add_chunk(number)
+            return chunk_res
+
+        results = await asyncio.gather(*[upload_chunk(number)
+                                         for number in upload.pending_chunks],
+                                       return_exceptions=True)
+        failed = upload.get_first_failure(
+            [(None, result) if isinstance(result, Exception) else (result, None)
+             for result in results])
+        if failed is not None:
+            return failed
+
+        res = await self._uploads_requester.move(**upload.get_move_kwargs())
+        if res.is_ok:
+            upload.journal.remove()
         return res
 
+    async def changes_since(self, uid, path=None, sync_token=None, infinite=True, limit=None):
+        return self._get_changes_response(
+            await self.requester.report(**self._get_sync_collection_kwargs(uid, path, sync_token,
+                                                                            infinite, limit)))
+
+    async def search_files(self, uid, scope=None, where=None, order_by=None, limit=None,
+                           page_size=SEARCH_PAGE_SIZE):
+        offset = 0
+        while limit is None or offset < limit:
+            page_limit = page_size if limit is None else min(page_size, limit - offset)
+            data = self._get_search_request(uid, scope, where, order_by, page_limit, offset)
+            res = await self._dav_requester.search("/", data=data)
+            files = self._get_search_files(res)
+            for file_data in files:
+                yield file_data
+            if len(files) < page_limit:
+                break
+            offset += len(files)
+
+    async def delete_paths(self, uid, paths, max_workers=DEFAULT_MAX_WORKERS):
+        deleted_paths, covered_paths = self._collapse_deleted_paths(paths)
+        async for path, res, exception in aiter_concurrently(
+                lambda path: self.delete_path(uid, path), deleted_paths, max_workers):
+            yield path, res, exception
+            for covered_path in covered_paths.get(path, []):
+                yield covered_path, res, exception
+
+    async def move_paths(self, uid, paths, overwrite=False, max_workers=DEFAULT_MAX_WORKERS):
+        async for (path, destination_path), res, exception in aiter_concurrently(
+                lambda each: self.move_path(uid, *each, overwrite=overwrite), paths, max_workers):
+            yield path, destination_path, res, exception
+
+    async def copy_paths(self, uid, paths, overwrite=False, max_workers=DEFAULT_MAX_WORKERS):
+        async for (path, destination_path), res, exception in aiter_concurrently(
+                lambda each: self.copy_path(uid, *each, overwrite=overwrite), paths, max_workers):
+            yield path, destination_path, res, exception
+
+    async def list_favorites(self, uid, path=""):
+        url = "/".join([uid, path])
+        res = await self.requester.report(additional_url=url, data=self.FAVORITES_REPORT)
+        return self._get_files_response(res)
+
+
+class ChunksReader(io.RawIOBase):
+    """ Read-only binary file object over iterator of bytes, e.g. chunks of streamed response """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class ParallelDownload(object):
+    """
+    State of download of file by ranges, shared by WebDAV and AsyncWebDAV
+
+    Ranges are written to "<local_path>.part" at their offsets and recorded
+    in "<local_path>.part.journal".
+    """
+
+    def __init__(self, local_path, range_size, size, etag, href):
+        self.local_path = local_path
+        self.range_size = range_size
+        self.size = size
+        self.etag = etag
+        self.part_path = "{}.part".format(local_path)
+        self.journal = TransferJournal("{}.journal".format(self.part_path), href=href, etag=etag,
+                                       size=size, range_size=range_size)
+        if not self.journal.resumed or not os.path.exists(self.part_path):
+            self.journal.clear_chunks()
+            with open(self.part_path, 'wb') as f:
+                f.truncate(size)
+
+    @property
+    def pending_ranges(self):
+        """ Numbers of ranges which aren't downloaded yet """
+        return [number for number in range(math.ceil(self.size / self.range_size))
+                if number not in self.journal.done_chunks]
+
+    def get_range_headers(self, number):
+        start = number * self.range_size
+        end = min(start + self.range_size, self.size) - 1
+        # If-Range makes server send whole file instead of range if file changed
+        headers = {"Range": "bytes={}-{}".format(start, end)}
+        if self.etag:
+            headers["If-Range"] = self.etag
+        return headers
+
+    def open_range(self, number):
+        """ Open partial file for writing range at its offset """
+        f = open(self.part_path, 'r+b')
+        f.seek(number * self.range_size)
+        return f
+
+    @staticmethod
+    def raise_first_exception(outcomes):
+        """ Wait for all (item, result, exception) outcomes, then raise first exception """
+        exceptions = [exception for _, _, exception in outcomes if exception is not None]
+        if exceptions:
+            raise exceptions[0]
+
+    def finish(self):
+        """ Rename partial file to local path, when all ranges are downloaded """
+        os.replace(self.part_path, self.local_path)
+        self.journal.remove()
+
+
+class ChunkedUpload(object):
+    """ State of chunked upload of local file, shared by WebDAV and AsyncWebDAV """
+
+    def __init__(self, uid, local_filepath, timestamp, chunk_size, journal_path, destination):
+        self.local_filepath = local_filepath
+        self.chunk_size = chunk_size
+        self.destination = destination
+        self.file_size = os.path.getsize(local_filepath)
+        file_mtime = os.path.getmtime(local_filepath)
+        self.timestamp = int(file_mtime) if timestamp is None else timestamp
+        self.chunks_count = max(1, math.ceil(self.file_size / chunk_size))
+        if self.chunks_count > MAX_UPLOAD_CHUNKS:
+            min_chunk_size = math.ceil(self.file_size / MAX_UPLOAD_CHUNKS)
+            raise ValueError("File is too big for given chunk size, chunk size has to be "
+                             "at least {} bytes".format(min_chunk_size))
+        self.journal = TransferJournal(journal_path, destination=destination, size=self.file_size,
+                                       mtime=file_mtime, chunk_size=chunk_size)
+        self.transfer_url = "/".join([uid, self.journal.transfer_id])
+
+    def get_make_collection_kwargs(self):
+        """ Build requester.make_collection arguments for creating transfer collection """
+        return dict(additional_url=self.transfer_url,
+                    headers={"Destination": self.destination.encode('utf-8')})
+
+    def is_transfer_collection_ready(self, res):
+        """ Check response of creating transfer collection, chunks can be uploaded if True """
+        if res.is_ok:
+            # transfer collection is new, chunks recorded in journal (if any) expired on server
+            self.journal.clear_chunks()
+            return True
+        return (self.journal.resumed
+                and res.raw.status_code == WebDAVStatusCodes.ALREADY_EXISTS_CODE)
+
+    @property
+    def pending_chunks(self):
+        """ Numbers of chunks which aren't uploaded yet """
+        return [number for number in range(1, self.chunks_count + 1)
+                if number not in self.journal.done_chunks]
+
+    def get_put_chunk_kwargs(self, number):
+        """ Read chunk and build requester.put_chunk arguments for uploading it """
+        with open(self.local_filepath, 'rb') as f:
+            f.seek((number - 1) * self.chunk_size)
+            chunk = f.read(self.chunk_size)
+        return dict(url="/".join([self.transfer_url, str(number)]), data=chunk,
+                    destination=self.destination, total_length=self.file_size)
+
+    @staticmethod
+    def get_first_failure(outcomes):
+        """
+        Get first failed chunk response, if any chunk failed
+
+        Args:
+            outcomes (list): (response, exception) of every uploaded chunk
+
+        Returns:
+            response which is not ok, None if all chunks are uploaded, first
+            exception is raised
+        """
+        for chunk_res, exception in outcomes:
+            if exception is not None:
+                raise exception
+        return next((chunk_res for chunk_res, _ in outcomes if not chunk_res.is_ok), None)
+
+    def get_move_kwargs(self):
+        """ Build requester.move arguments for assembling uploaded chunks """
+        headers = {"X-OC-Mtime": f"{self.timestamp:.0f}", "OC-Total-Length": str(self.file_size)}
+        return dict(url="/".join([self.transfer_url, ".file"]), destination=self.destination,
+                    overwrite=True, headers=headers)
+
+
+class BulkUploadFile(object):
+    """ File uploaded by WebDAV.bulk_upload, either local file or bytes """
+
+    def __init__(self, source, remote_filepath, timestamp=None):
+        self.source = source
+        self.remote_filepath = remote_filepath
+        if isinstance(source, bytes):
+            self.size = len(source)
+            self.timestamp = timestamp if timestamp is not None else time.time()
+        else:
+            self.size = os.path.getsize(source)
+            self.timestamp = timestamp if timestamp is not None else os.path.getmtime(source)
+
+    def read(self):
+        if isinstance(self.source, bytes):
+            return self.source
+        with open(self.source, 'rb') as f:
+            return f.read()
+
+
+class BulkUploadResult(object):
+    """ Outcome of upload of single file by WebDAV.bulk_upload """
+
+    def __init__(self, remote_filepath, is_ok, etag=None, file_id=None, message=None,
+                 response=None):
+        self.remote_filepath = remote_filepath
+        self.is_ok = is_ok
+        self.etag = etag
+        self.file_id = file_id
+        self.message = message
+        self.response = response
+
+    def __repr__(self):
+        is_ok_str = "OK" if self.is_ok else "Failed"
+        return "<BulkUploadResult: {}: {}>".format(self.remote_filepath, is_ok_str)
+
+
+class KnownFolders(object):
+    """
+    Bounded set of folders known to exist, least recently used are forgotten first
+
+    Folders are (uid, path) pairs, it's safe to use from several threads.
+    """
+
+    def __init__(self, maxsize=KNOWN_FOLDERS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._folders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, folder):
+        with self._lock:
+            if folder not in self._folders:
+                return False
+            self._folders.move_to_end(folder)
+            return True
+
+    def __len__(self):
+        return len(self._folders)
+
+    def add(self, uid, path):
+        with self._lock:
+            self._folders[(uid, path)] = True
+            self._folders.move_to_end((uid, path))
+            while len(self._folders) > self.maxsize:
+                self._folders.popitem(last=False)
+
+    def get_known_count(self, uid, folders):
+        """ Get number of top folders of tree known to exist, folders are ordered from top """
+        for count in range(len(folders), 0, -1):
+            if (uid, folders[count - 1]) in self:
+                return count
+        return 0
+
+    def discard_tree(self, uid, path):
+        """ Forget folder and all its subfolders """
+        path = path.strip("/")
+        with self._lock:
+            for folder in [folder for folder in self._folders
+                           if folder[0] == uid and (not path or folder[1] == path
+                                                    or folder[1].startswith(path + "/"))]:
+                del self._folders[folder]
+
+
+class TransferJournal(object):
+    """
+    Progress of chunked transfer, saved as json to local file after every chunk
+
+    Journal saved for the same transfer (e.g. destination, size, mtime and chunk
+    size of uploaded file) is resumed, otherwise new transfer is started. Without
+    path journal is kept only in memory.
+    """
+
+    def __init__(self, path, **transfer):
+        self.path = path
+        self.transfer = transfer
+        self._lock = threading.Lock()
+        saved = self._load()
+        self.resumed = bool(saved) and saved.get('transfer') == transfer
+        if self.resumed:
+            self.transfer_id = saved['transfer_id']
+            self.done_chunks = set(saved['done_chunks'])
+        else:
+            self.transfer_id = "nextcloud-api-{}".format(uuid.uuid4().hex)
+            self.done_chunks = set()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except ValueError:
+            # broken journal, e.g. crash while writing it
+            return None
+
+    def save(self):
+        if not self.path:
+            return
+        data = dict(transfer=self.transfer, transfer_id=self.transfer_id,
+                    done_chunks=sorted(self.done_chunks))
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def add_chunk(self, number):
+        with self._lock:
+            self.done_chunks.add(number)
+            self.save()
+
+    def clear_chunks(self):
+        with self._lock:
+            self.done_chunks.clear()
+            self.save()
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
 
 class File(object):
     SUCCESS_STATUS = 'HTTP/1.1 200 OK'
@@ -299,41 +1914,117 @@ class File(object):
         "oc": "http://owncloud.org/ns",
         "nc": "http://nextcloud.org/ns"
     }
+    # key is NextCloud property tag in Clark notation ({namespace}name), value is python
+    # variable name, filled in below from FILE_PROPERTIES for every namespace
+    PROPERTY_TAGS = {}
+    HREF_TAG = '{DAV:}href'
+    PROPSTAT_TAG = '{DAV:}propstat'
+    STATUS_TAG = '{DAV:}status'
+    PROP_TAG = '{DAV:}prop'
     COLLECTION_RESOURCE_TYPE = 'collection'
 
+    # properties which were not returned are not set
+    __slots__ = tuple(FILE_PROPERTIES.values())
+
     def __init__(self, xml_data):
-        self.href = xml_data.find('d:href', self.xml_namespaces_map).text
-        for propstat in xml_data.iter('{DAV:}propstat'):
-            if propstat.find('d:status', self.xml_namespaces_map).text != self.SUCCESS_STATUS:
+        property_tags = self.PROPERTY_TAGS
+        for child in xml_data:
+            if child.tag == self.HREF_TAG:
+                self.href = child.text
                 continue
-            for file_property in propstat.find('d:prop', self.xml_namespaces_map):
-                file_property_name = re.sub("{.*}", "", file_property.tag)
-                if file_property_name not in self.FILE_PROPERTIES:
+            if child.tag != self.PROPSTAT_TAG:
+                continue
+            status = child.find(self.STATUS_TAG)
+            if status is None or status.text != self.SUCCESS_STATUS:
+                continue
+            for file_property in child.find(self.PROP_TAG):
+                attribute_name = property_tags.get(file_property.tag)
+                if attribute_name is None:
                     continue
-                if file_property_name == 'resourcetype':
+                if attribute_name == 'resource_type':
                     value = self._extract_resource_type(file_property)
+                elif attribute_name == 'check_sums':
+                    value = self._extract_check_sums(file_property)
                 else:
                     value = file_property.text
-                setattr(self, self.FILE_PROPERTIES[file_property_name], value)
+                setattr(self, attribute_name, value)
 
     def _extract_resource_type(self, file_property):
-        file_type = list(file_property)
-        if file_type:
-            return re.sub("{.*}", "", file_type[0].tag)
+        for file_type in file_property:
+            return file_type.tag.rpartition('}')[2]
         return None
 
+    def _extract_check_sums(self, file_property):
+        # checksums are space separated "<algorithm>:<hex digest>" in oc:checksum elements
+        check_sums = " ".join(check_sum.text for check_sum in file_property if check_sum.text)
+        return check_sums or file_property.text
+
     def as_dict(self):
-        return {key: value
-                for key, value in self.__dict__.items()
-                if key in self.FILE_PROPERTIES.values()}
+        file_dict = {}
+        for attribute_name in self.__slots__:
+            try:
+                file_dict[attribute_name] = getattr(self, attribute_name)
+            except AttributeError:
+                continue
+        return file_dict
+
+
+File.PROPERTY_TAGS.update({
+    "{{{}}}{}".format(namespace, property_name): attribute_name
+    for namespace in File.xml_namespaces_map.values()
+    for property_name, attribute_name in File.FILE_PROPERTIES.items()
+})
+
+
+class MultistatusParser(object):
+    """
+    Incremental parser of WebDAV multistatus response
+
+    Fed with chunks of response body, it returns File for every d:response
+    as soon as it's parsed. Parsed elements are dropped from the tree, so
+    memory use doesn't grow with the number of responses.
+    """
+    RESPONSE_TAG = '{DAV:}response'
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+
+    def feed(self, data):
+        """ Parse next chunk of response body, return list of files parsed so far """
+        self._parser.feed(data)
+        return self._read_files()
+
+    def close(self):
+        """ Finish parsing, return list of remaining files """
+        self._parser.close()
+        return self._read_files()
+
+    def _read_files(self):
+        files = []
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = element
+            elif element.tag == self.RESPONSE_TAG:
+                files.append(File(element))
+                try:
+                    self._root.remove(element)
+                except ValueError:  # not a direct child of d:multistatus
+                    element.clear()
+        return files
 
 
 class WebDAVStatusCodes(object):
+    OK_CODE = 200
     CREATED_CODE = 201
     NO_CONTENT_CODE = 204
+    PARTIAL_CONTENT_CODE = 206
     MULTISTATUS_CODE = 207
+    NOT_FOUND_CODE = 404
     ALREADY_EXISTS_CODE = 405
     PRECONDITION_FAILED_CODE = 412
+    INSUFFICIENT_STORAGE_CODE = 507
 
 
 def timestamp_to_epoch_time(rfc1123_date=""):
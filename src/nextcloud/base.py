@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
 import enum
+import asyncio
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_PREFETCH_PAGES = 2
 
 
 class WithRequester(object):
@@ -7,17 +13,143 @@ class WithRequester(object):
     API_URL = NotImplementedError
 
     def __init__(self, requester):
-        self._requester = requester
+        # bind own copy of requester to API_URL, so wrappers sharing
+        # one requester don't change it for each other
+        self._requester = requester.with_context(api_url=self.API_URL,
+                                                 success_code=getattr(self, 'SUCCESS_CODE', None))
 
     @property
     def requester(self):
         """ Get requester instance """
-        # dynamically set API_URL for requester
-        self._requester.API_URL = self.API_URL
-        self._requester.SUCCESS_CODE = getattr(self, 'SUCCESS_CODE', None)
         return self._requester
 
 
+def iter_concurrently(func, items, max_workers):
+    """
+    Call function with every item from pool of threads, yield outcomes as calls finish
+
+    Items are taken lazily, at most max_workers calls are in flight at once, so
+    items can be a generator of any size.
+
+    Args:
+        func (callable): function called with single item
+        items (iterable): items to call function with
+        max_workers (int): maximum number of calls run at once
+
+    Returns:
+        iterator of (item, result, exception) tuples, in order of finished calls,
+        exception is None if call didn't raise
+    """
+    items = iter(items)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while True:
+                for item in items:
+                    in_flight[executor.submit(func, item)] = item
+                    if len(in_flight) >= max_workers:
+                        break
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    exception = future.exception()
+                    yield item, None if exception else future.result(), exception
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+async def aiter_concurrently(func, items, max_workers):
+    """
+    Asynchronous version of iter_concurrently, func is coroutine function
+
+    Returns:
+        async iterator of (item, result, exception) tuples, in order of finished calls
+    """
+    items = iter(items)
+    in_flight = {}
+    try:
+        while True:
+            for item in items:
+                in_flight[asyncio.ensure_future(func(item))] = item
+                if len(in_flight) >= max_workers:
+                    break
+            if not in_flight:
+                return
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                exception = future.exception()
+                yield item, None if exception else future.result(), exception
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_pages(fetch_page, page_size, prefetch=DEFAULT_PREFETCH_PAGES):
+    """
+    Iterate over items of paged listing, fetching next pages in background
+
+    While items of one page are yielded, up to prefetch following pages are
+    fetched from pool of threads. Page shorter than page_size is the last one.
+
+    Args:
+        fetch_page (callable): function called with offset, returns list of items
+        page_size (int): number of items requested per page
+        prefetch (int): number of pages fetched ahead, 0 fetches pages one by one
+
+    Returns:
+        iterator of items, in order of listing
+    """
+    if page_size < 1:
+        raise ValueError("Page size must be positive")
+    with ThreadPoolExecutor(max_workers=prefetch + 1) as executor:
+        pages = deque()
+        next_offset = 0
+        try:
+            while True:
+                while len(pages) < prefetch + 1:
+                    pages.append(executor.submit(fetch_page, next_offset))
+                    next_offset += page_size
+                items = pages.popleft().result()
+                for item in items:
+                    yield item
+                if len(items) < page_size:
+                    # the last page, pages after it are empty
+                    return
+        finally:
+            for future in pages:
+                future.cancel()
+
+
+async def aiter_pages(fetch_page, page_size, prefetch=DEFAULT_PREFETCH_PAGES):
+    """
+    Asynchronous version of iter_pages, fetch_page is coroutine function
+
+    Returns:
+        async iterator of items, in order of listing
+    """
+    if page_size < 1:
+        raise ValueError("Page size must be positive")
+    pages = deque()
+    next_offset = 0
+    try:
+        while True:
+            while len(pages) < prefetch + 1:
+                pages.append(asyncio.ensure_future(fetch_page(next_offset)))
+                next_offset += page_size
+            items = await pages.popleft()
+            for item in items:
+                yield item
+            if len(items) < page_size:
+                return
+    finally:
+        for future in pages:
+            future.cancel()
+
+
 class OCSCode(enum.IntEnum):
     OK = 100
     SERVER_ERROR = 996
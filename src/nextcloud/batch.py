@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BatchResult(object):
+    """ Outcome of single call of batch """
+
+    def __init__(self, method_name, args, kwargs, result=None, exception=None):
+        self.method_name = method_name
+        self.args = args
+        self.kwargs = kwargs
+        self.result = result
+        self.exception = exception
+
+    @property
+    def is_ok(self):
+        """ Call didn't raise and its response (if any) is successful """
+        if self.exception is not None or self.result is False:
+            return False
+        return getattr(self.result, 'is_ok', True) is not False
+
+    def __repr__(self):
+        is_ok_str = "OK" if self.is_ok else "Failed"
+        return "<BatchResult: {}: {}>".format(self.method_name, is_ok_str)
+
+
+class Batch(object):
+    """
+    Collect NextCloud api calls and run them concurrently
+
+    Any api method of NextCloud can be called on batch, the call is recorded and
+    its index in batch returned. Recorded calls are run by a pool of max_workers
+    threads, results are returned in order of calls. Failure (exception or
+    response which is not ok) of one call doesn't abort the others:
+
+        with nxc.batch(max_workers=8) as batch:
+            for uid in uids:
+                batch.add_user(uid, password)
+                batch.add_to_group(uid, gid)
+        failed = [res for res in batch.results if not res.is_ok]
+
+    Calls are run independently, so calls depending on each other (like adding
+    user to group after creating it) should be put in separate batches.
+    """
+
+    def __init__(self, nxc, max_workers):
+        """
+        Args:
+            nxc (NextCloud): client to call api methods on
+            max_workers (int): number of calls run at once
+        """
+        self._nxc = nxc
+        self.max_workers = max_workers
+        self.calls = []
+        self.results = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self._nxc, name)
+        if not callable(method):
+            raise AttributeError("{} is not an api method".format(name))
+
+        def record_call(*args, **kwargs):
+            self.calls.append((name, method, args, kwargs))
+            return len(self.calls) - 1
+        return record_call
+
+    def __len__(self):
+        return len(self.calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
+
+    @staticmethod
+    def _run_call(call):
+        method_name, method, args, kwargs = call
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            return BatchResult(method_name, args, kwargs, exception=e)
+        return BatchResult(method_name, args, kwargs, result=result)
+
+    def run(self):
+        """
+        Run recorded calls, recorded calls are cleared
+
+        Returns:
+            list of BatchResult, in order of calls
+        """
+        calls, self.calls = self.calls, []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self.results = list(executor.map(self._run_call, calls))
+        return self.results
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+
+from urllib.parse import unquote
+
+from .api_wrappers.webdav import DEFAULT_MAX_WORKERS, File
+
+
+def as_file_dict(file_data):
+    """ Get properties of listed file as dict, whether it's File object or dict already """
+    return file_data.as_dict() if isinstance(file_data, File) else dict(file_data)
+
+
+def is_collection(file_dict):
+    return file_dict.get('resource_type') == File.COLLECTION_RESOURCE_TYPE
+
+
+class IndexChanges(object):
+    """ Files added, modified and removed since previous refresh of index, lists of hrefs """
+
+    def __init__(self, added=None, modified=None, removed=None):
+        self.added = added or []
+        self.modified = modified or []
+        self.removed = removed or []
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def __repr__(self):
+        return "<IndexChanges: {} added, {} modified, {} removed>".format(
+            len(self.added), len(self.modified), len(self.removed))
+
+
+class RemoteIndex(object):
+    """
+    Persistent local index of files properties of user folder tree, keyed by href
+
+    Index is kept in SQLite database. Nextcloud changes etag of folder whenever
+    anything under it changes, so refresh lists only folders whose etag changed:
+    if nothing changed, refresh costs one PROPFIND request, whatever the size of
+    the tree is.
+
+        with RemoteIndex(nxc, uid, "files.db") as index:
+            changes = index.refresh()
+            for href in changes.added:
+                print(index.get(href))
+
+    Files are stored as dicts of File properties.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            href TEXT PRIMARY KEY,
+            parent TEXT,
+            etag TEXT,
+            is_collection INTEGER NOT NULL,
+            properties TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_parent ON files (parent);
+    """
+
+    def __init__(self, nxc, uid, db_path, path=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Args:
+            nxc (NextCloud): client to list files with
+            uid (str): uid of user
+            db_path (str): path of SQLite database, created if it doesn't exist
+            path (str/None): path of indexed folder, user root by default
+            max_workers (int): maximum number of folders listed at once
+        """
+        self._nxc = nxc
+        self.uid = uid
+        self.path = (path or "").strip("/")
+        self.max_workers = max_workers
+        # transactions are managed explicitly
+        self._connection = sqlite3.connect(db_path, isolation_level=None)
+        self._connection.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def __iter__(self):
+        for properties, in self._connection.execute("SELECT properties FROM files"):
+            yield json.loads(properties)
+
+    def get(self, href):
+        """ Get properties of indexed file by href, None if file isn't indexed """
+        row = self._connection.execute("SELECT properties FROM files WHERE href = ?",
+                                       (href,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_folder(self, href):
+        """ Get properties of indexed files of folder by its href """
+        return [json.loads(properties) for properties, in self._connection.execute(
+            "SELECT properties FROM files WHERE parent = ? ORDER BY href", (href,))]
+
+    def refresh(self):
+        """
+        Bring index up to date with Nextcloud
+
+        Top folder is checked with Depth: 0 request, then only folders with
+        changed etag are listed, concurrently. Index is updated in one
+        transaction, so interrupted refresh leaves it as it was.
+
+        Returns:
+            IndexChanges
+        """
+        res = self._nxc.list_folders(self.uid, self.path, depth=0)
+        if not res.is_ok or not res.data:
+            raise ValueError("Failed to list indexed folder, status code: {}"
+                             .format(res.raw.status_code))
+        top = as_file_dict(res.data[0])
+        indexed_top = self._connection.execute("SELECT etag FROM files WHERE href = ?",
+                                               (top['href'],)).fetchone()
+        if indexed_top is not None and indexed_top[0] == top.get('etag'):
+            return IndexChanges()
+
+        changes = IndexChanges()
+        if indexed_top is None:
+            changes.added.append(top['href'])
+        self._connection.execute("BEGIN")
+        with self._connection:
+            self._save_file(top, parent=self._get_parent_href(top['href']))
+            # hrefs of folders to be listed by their path
+            folder_hrefs = {self.path: top['href']}
+            for dirpath, dirs, files in self._nxc.walk(self.uid, self.path,
+                                                       max_workers=self.max_workers):
+                folder_href = folder_hrefs.pop(dirpath)
+                dirs[:] = self._update_folder(folder_href, dirs, files, changes)
+                for each in dirs:
+                    folder_hrefs[self._get_child_path(dirpath, each)] = as_file_dict(each)['href']
+        return changes
+
+    def _update_folder(self, folder_href, dirs, files, changes):
+        """ Save listing of folder, return its subfolders which changed """
+        indexed = dict(self._connection.execute(
+            "SELECT href, etag FROM files WHERE parent = ?", (folder_href,)))
+        changed_dirs = []
+        for file_data in dirs + files:
+            file_dict = as_file_dict(file_data)
+            href = file_dict['href']
+            if href not in indexed:
+                changes.added.append(href)
+            elif indexed.pop(href) == file_dict.get('etag'):
+                continue
+            elif not is_collection(file_dict):
+                changes.modified.append(href)
+            if is_collection(file_dict):
+                changed_dirs.append(file_data)
+            self._save_file(file_dict, parent=folder_href)
+        for href in indexed:
+            changes.removed.extend(self._remove_file(href))
+        return changed_dirs
+
+    def _save_file(self, file_dict, parent):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO files (href, parent, etag, is_collection, properties) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (file_dict['href'], parent, file_dict.get('etag'), is_collection(file_dict),
+             json.dumps(file_dict)))
+
+    def _remove_file(self, href):
+        """ Remove file or folder with all its content from index, return removed hrefs """
+        removed = [href]
+        if href.endswith("/"):
+            removed.extend(descendant for descendant, in self._connection.execute(
+                "SELECT href FROM files WHERE substr(href, 1, ?) = ? AND href != ?",
+                (len(href), href, href)))
+            self._connection.execute("DELETE FROM files WHERE substr(href, 1, ?) = ?",
+                                     (len(href), href))
+        else:
+            self._connection.execute("DELETE FROM files WHERE href = ?", (href,))
+        return removed
+
+    @staticmethod
+    def _get_parent_href(href):
+        return href.rstrip("/").rpartition("/")[0] + "/"
+
+    @staticmethod
+    def _get_child_path(dirpath, file_data):
+        """ Get path of listed subfolder the way it's yielded by walk """
+        name = as_file_dict(file_data)['href'].rstrip("/").rpartition("/")[2]
+        return "/".join([dirpath, unquote(name)]) if dirpath else unquote(name)
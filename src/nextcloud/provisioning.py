@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+
+from .base import QUOTA_UNLIMITED, iter_concurrently
+
+PROVISIONING_MAX_WORKERS = 10
+
+# record fields and their other accepted names
+RECORD_FIELDS = {
+    "uid": ("userid", "id"),
+    "password": ("passwd",),
+    "display_name": ("displayname", "displayName"),
+    "email": (),
+    "groups": (),
+    "subadmin": (),
+    "quota": (),
+    "language": (),
+}
+LIST_FIELDS = ("groups", "subadmin")
+QUOTA_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4,
+               "p": 1024 ** 5}
+
+
+def read_records(source, record_format=None):
+    """
+    Iterate over user records of CSV or NDJSON file, reading one record at a time
+
+    CSV file must have header row with field names, groups and subadmin groups
+    are separated by commas or semicolons. In NDJSON file they can be lists too.
+
+    Args:
+        source (str/file object): path of file, or text file object
+        record_format (str): "csv" or "ndjson", by default guessed by file extension
+
+    Returns:
+        iterator of records, dicts with RECORD_FIELDS keys
+
+    Raises:
+        ValueError: at once, if format is unknown or can't be guessed
+    """
+    if record_format is None:
+        record_format = _guess_record_format(getattr(source, 'name', source))
+    if record_format not in ("csv", "ndjson"):
+        raise ValueError("Unknown record format: {}".format(record_format))
+    return _iter_records(source, record_format)
+
+
+def _iter_records(source, record_format):
+    if not hasattr(source, 'read'):
+        with open(source, newline="") as f:
+            yield from _iter_records(f, record_format)
+        return
+    if record_format == "csv":
+        rows = csv.DictReader(source)
+    else:
+        rows = (json.loads(line) for line in source if line.strip())
+    for row in rows:
+        yield normalize_record(row)
+
+
+def _guess_record_format(name):
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ValueError("Can't guess format of records, please specify it")
+
+
+def normalize_record(row):
+    """ Get record with RECORD_FIELDS keys from row of CSV or NDJSON file """
+    record = {}
+    for field, other_names in RECORD_FIELDS.items():
+        value = next((row[name] for name in (field,) + other_names
+                      if row.get(name) not in (None, "")), None)
+        if field in LIST_FIELDS:
+            if isinstance(value, str):
+                value = [each.strip() for each in re.split("[,;]", value) if each.strip()]
+            value = [str(each) for each in value or []]
+        elif field == "uid" and value is not None:
+            # NDJSON ids can be numbers, existing users are listed by string ids
+            value = str(value)
+        record[field] = value
+    return record
+
+
+def quota_to_bytes(quota):
+    """
+    Get quota in bytes from number or human readable size, like "5 GB" or "5 GiB"
+
+    Returns:
+        int, QUOTA_UNLIMITED for "none", None if quota can't be parsed
+    """
+    if isinstance(quota, (int, float)):
+        return int(quota)
+    quota = str(quota).strip().lower()
+    if quota in ("none", "unlimited"):
+        return QUOTA_UNLIMITED
+    match = re.match(r"^(-?\d+(?:\.\d+)?)\s*([a-z]?)i?b?$", quota)
+    if match is None or match.group(2) not in QUOTA_UNITS:
+        return None
+    return int(round(float(match.group(1)) * QUOTA_UNITS[match.group(2)]))
+
+
+class ProvisioningResult(object):
+    """ Outcome of provisioning of single user record, with every call made for it """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    FAILED = "failed"
+
+    def __init__(self, number, uid):
+        self.number = number
+        self.uid = uid
+        self.status = self.UNCHANGED
+        # (method name, argument, response) of every call made
+        self.calls = []
+        self.error = None
+
+    @property
+    def is_ok(self):
+        return self.status != self.FAILED
+
+    def as_dict(self):
+        """ Get result as dict for log, without responses data """
+        return {
+            "record": self.number,
+            "uid": self.uid,
+            "status": self.status,
+            "calls": [{"method": method_name, "argument": argument,
+                       "status_code": getattr(res, 'status_code', None)}
+                      for method_name, argument, res in self.calls],
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return "<ProvisioningResult: {}: {}>".format(self.uid, self.status)
+
+
+class UserProvisioning(object):
+    """
+    Create and update users from records, concurrently and idempotently
+
+    Existing users with their groups, subadmin groups and quota are listed
+    once, by User.iter_users_details, before records are processed. Every
+    record is then handled by one worker, which makes only the calls needed
+    to bring its user in line with it, in order: add_user (for new user),
+    add_to_group, create_subadmin and edit_user for quota. Calls of a record
+    stop at the first failed one, because later ones depend on it, so running
+    provisioning again with the same records continues where it failed.
+
+        with open("results.ndjson", "w") as log_file:
+            results = UserProvisioning(nxc).run(read_records("users.csv"), log_file)
+
+    Passwords are used only for new users and never logged.
+    """
+
+    def __init__(self, nxc, max_workers=PROVISIONING_MAX_WORKERS):
+        """
+        Args:
+            nxc (NextCloud): client to provision users with
+            max_workers (int): number of records processed at once
+        """
+        self._nxc = nxc
+        self.max_workers = max_workers
+        self._existing_users = None
+
+    def run(self, records, log_file=None):
+        """
+        Provision users, results are yielded as records are done
+
+        Args:
+            records (iterable): user records, as read by read_records
+            log_file (file object): (optional) text file to write result of every
+                record to, as line of JSON
+
+        Returns:
+            iterator of ProvisioningResult, in order of finished records
+        """
+        self._existing_users = {details.id: details
+                                for details in self._nxc.iter_users_details()}
+        items = enumerate(records, start=1)
+        for (number, record), result, exception in iter_concurrently(self._provision, items,
+                                                                     self.max_workers):
+            if exception is not None:
+                result = ProvisioningResult(number, record.get("uid"))
+                result.status, result.error = ProvisioningResult.FAILED, str(exception)
+            if log_file is not None:
+                log_file.write(json.dumps(result.as_dict()) + "\n")
+                log_file.flush()
+            yield result
+
+    def _provision(self, item):
+        """ Make calls needed for record, in order, stop at the first failed one """
+        number, record = item
+        if not record["uid"]:
+            raise ValueError("Record without user id")
+        result = ProvisioningResult(number, record["uid"])
+        for method_name, argument, call in self._get_calls(record):
+            res = call()
+            result.calls.append((method_name, argument, res))
+            if not res.is_ok:
+                result.status = ProvisioningResult.FAILED
+                result.error = getattr(res, 'meta', {}).get('message') or "{} failed".format(
+                    method_name)
+                return result
+            if result.status == ProvisioningResult.UNCHANGED:
+                result.status = (ProvisioningResult.CREATED if method_name == "add_user"
+                                 else ProvisioningResult.UPDATED)
+        return result
+
+    def _get_calls(self, record):
+        """ Get (method name, argument, call) of every call needed to apply record """
+        uid = record["uid"]
+        existing = self._existing_users.get(uid)
+        calls = []
+        if existing is None:
+            calls.append(("add_user", None, lambda: self._nxc.add_user(
+                uid, record["password"], displayName=record["display_name"],
+                email=record["email"], language=record["language"])))
+        current_groups = set(existing.groups or []) if existing is not None else set()
+        for gid in record["groups"]:
+            if gid not in current_groups:
+                calls.append(("add_to_group", gid,
+                              lambda gid=gid: self._nxc.add_to_group(uid, gid)))
+        current_subadmin = set(existing.subadmin or []) if existing is not None else set()
+        for gid in record["subadmin"]:
+            if gid not in current_subadmin:
+                calls.append(("create_subadmin", gid,
+                              lambda gid=gid: self._nxc.create_subadmin(uid, gid)))
+        quota = record["quota"]
+        if quota is not None and not self._has_quota(existing, quota):
+            calls.append(("edit_user", "quota",
+                          lambda: self._nxc.edit_user(uid, "quota", str(quota))))
+        return calls
+
+    @staticmethod
+    def _has_quota(existing, quota):
+        if existing is None:
+            return False
+        quota_bytes = quota_to_bytes(quota)
+        return quota_bytes is not None and quota_bytes == quota_to_bytes(existing.quota)
+
+
+def main(argv=None):
+    """
+    Provision users from CSV or NDJSON file, print result of every record as line of JSON
+
+    Credentials can be given by NEXTCLOUD_ENDPOINT, NEXTCLOUD_USER and
+    NEXTCLOUD_PASSWORD environment variables. Exit status is 1 if any record failed.
+    """
+    from .NextCloud import NextCloud
+
+    parser = argparse.ArgumentParser(description="Create and update Nextcloud users from "
+                                                 "CSV or NDJSON file")
+    parser.add_argument("source", help="path of records file, - for standard input")
+    parser.add_argument("--format", choices=["csv", "ndjson"], dest="record_format",
+                        help="format of records, by default guessed by file extension, "
+                             "required for standard input")
+    parser.add_argument("--endpoint", default=os.environ.get("NEXTCLOUD_ENDPOINT"))
+    parser.add_argument("--user", default=os.environ.get("NEXTCLOUD_USER"))
+    parser.add_argument("--password", default=os.environ.get("NEXTCLOUD_PASSWORD"))
+    parser.add_argument("--log", help="path of results log, standard output by default")
+    parser.add_argument("--max-workers", type=int, default=PROVISIONING_MAX_WORKERS)
+    args = parser.parse_args(argv)
+    if not (args.endpoint and args.user and args.password):
+        parser.error("endpoint, user and password are required")
+    if args.source == "-" and args.record_format is None:
+        parser.error("--format is required when reading from standard input")
+
+    source = sys.stdin if args.source == "-" else args.source
+    try:
+        records = read_records(source, args.record_format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    log_file = open(args.log, "a") if args.log else sys.stdout
+    failed = 0
+    try:
+        with NextCloud(args.endpoint, args.user, args.password) as nxc:
+            for result in UserProvisioning(nxc, max_workers=args.max_workers).run(records,
+                                                                                  log_file):
+                failed += not result.is_ok
+    finally:
+        if log_file is not sys.stdout:
+            log_file.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
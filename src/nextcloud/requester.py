@@ -1,14 +1,79 @@
 # -*- coding: utf-8 -*-
+import copy
 import requests
 from functools import wraps
+from requests.adapters import HTTPAdapter
+from requests.utils import super_len
+
+try:
+    import httpx
+except ImportError:  # httpx is needed only by AsyncNextCloud
+    httpx = None
 
 from .response import WebDAVResponse, OCSResponse
 
 
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_ASYNC_MAX_CONNECTIONS = 100
+DEFAULT_ASYNC_MAX_KEEPALIVE_CONNECTIONS = 20
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
 class NextCloudConnectionError(Exception):
     """ A connection error occurred """
 
 
+def build_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                  keep_alive=True):
+    """
+    Build HTTP session with a connection pool, which can be shared between requesters
+
+    Args:
+        pool_connections (int): number of per-host connection pools to cache
+        pool_maxsize (int): maximum number of connections kept open to a single host
+        keep_alive (bool): reuse connections between requests, if False every
+            request asks the server to close connection after response
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def build_async_client(max_connections=DEFAULT_ASYNC_MAX_CONNECTIONS,
+                       max_keepalive_connections=DEFAULT_ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+                       keep_alive=True):
+    """
+    Build asynchronous HTTP client with a connection pool, which can be shared between
+    async requesters
+
+    Requests exceeding max_connections wait for a free connection instead of failing,
+    so any number of coroutines can use the client concurrently.
+
+    Args:
+        max_connections (int): maximum number of concurrently open connections
+        max_keepalive_connections (int): maximum number of idle connections kept open
+        keep_alive (bool): reuse connections between requests
+
+    Returns:
+        httpx.AsyncClient
+    """
+    if httpx is None:
+        raise ImportError("Asynchronous client requires httpx, "
+                          "install it with: pip install nextcloud[async]")
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections if keep_alive else 0)
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(None), follow_redirects=True)
+
+
 def catch_connection_error(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -20,9 +85,55 @@ def catch_connection_error(func):
     return wrapper
 
 
+def catch_async_connection_error(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except httpx.HTTPError as e:
+            try:
+                url = str(e.request.url)
+            except RuntimeError:  # request is not attached to exception
+                url = None
+            raise NextCloudConnectionError("Failed to establish connection to NextCloud",
+                                           url, e)
+    return wrapper
+
+
+class StreamedResponse(object):
+    """
+    Response of requests or httpx with unread body, other attributes are of wrapped response
+
+    Body is read later, outside of send, so connection errors raised while it's
+    read by iter_content (or aiter_bytes of httpx response) are turned into
+    NextCloudConnectionError here.
+    """
+
+    def __init__(self, response):
+        self._response = response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size=1):
+        try:
+            yield from self._response.iter_content(chunk_size)
+        except requests.RequestException as e:
+            raise NextCloudConnectionError("Connection to NextCloud lost while reading response",
+                                           self._response.url, e)
+
+    async def aiter_bytes(self, chunk_size=None):
+        try:
+            async for chunk in self._response.aiter_bytes(chunk_size):
+                yield chunk
+        except httpx.HTTPError as e:
+            raise NextCloudConnectionError("Connection to NextCloud lost while reading response",
+                                           str(self._response.url), e)
+
+
 class Requester(object):
-    def __init__(self, endpoint, user, passwd, json_output=False):
-        self.query_components = []
+    def __init__(self, endpoint, user, passwd, json_output=False, session=None):
+        self.session = session if session is not None else build_session()
 
         self.json_output = json_output
 
@@ -36,6 +147,30 @@ class Requester(object):
         self.API_URL = None
         self.SUCCESS_CODE = None
 
+    def with_context(self, api_url, success_code=None):
+        """
+        Get copy of requester bound to api url and success code of api wrapper
+
+        Copies share session, credentials and headers, which are never modified
+        after creation, so every api wrapper gets its own request context and
+        requests of different wrappers can be sent from several threads at once.
+
+        Args:
+            api_url (str): api url of wrapper
+            success_code (int): OCS status code of successful response
+
+        Returns:
+            Requester
+        """
+        requester = copy.copy(self)
+        requester.API_URL = api_url
+        requester.SUCCESS_CODE = success_code
+        return requester
+
+    def close(self):
+        """ Close all pooled connections of requester session """
+        self.session.close()
+
     def rtn(self, resp):
         if self.json_output:
             return resp.json()
@@ -43,37 +178,58 @@ class Requester(object):
             return resp.content.decode("UTF-8")
 
     @catch_connection_error
+    def send(self, method, url, handler=None, **kwargs):
+        """
+        Send request through requester session
+
+        All requests go through this method, so the way requests are built
+        is shared by synchronous and asynchronous requesters.
+
+        Args:
+            method (str): HTTP method
+            url (str): full url
+            handler (callable): function to build result from response, self.rtn by default
+            **kwargs: request arguments (headers, params, data, json)
+
+        Returns:
+            result of handler
+        """
+        res = self.session.request(method, url, auth=self.auth_pk, **kwargs)
+        return (handler or self.rtn)(res)
+
     def get(self, url="", params=None):
         url = self.get_full_url(url)
-        res = requests.get(url, auth=self.auth_pk, headers=self.h_get, params=params)
-        return self.rtn(res)
+        return self.send("GET", url, headers=self.h_get, params=params)
 
-    @catch_connection_error
     def post(self, url="", data=None):
         url = self.get_full_url(url)
-        res = requests.post(url, auth=self.auth_pk, json=data, headers=self.h_post)
-        return self.rtn(res)
+        return self.send("POST", url, json=data, headers=self.h_post)
 
-    @catch_connection_error
-    def put_with_timestamp(self, url="", data=None, timestamp=None):
-        h_post = self.h_post
+    def put_with_timestamp(self, url="", data=None, timestamp=None, checksum=None):
+        """
+        Upload raw body, set its modification time if timestamp is given
+
+        data can be bytes, binary file object or iterable of bytes, file objects
+        and iterables are streamed without reading them into memory at once
+        (iterables are sent with chunked transfer encoding). checksum
+        ("<algorithm>:<hex digest>") is sent in OC-Checksum header.
+        """
+        headers = dict(self.h_post)
+        headers["Content-Type"] = "application/octet-stream"
         if isinstance(timestamp, (float, int)):
-            h_post["X-OC-MTIME"] = f"{timestamp:.0f}"
+            headers["X-OC-MTIME"] = f"{timestamp:.0f}"
+        if checksum:
+            headers["OC-Checksum"] = checksum
         url = self.get_full_url(url)
-        res = requests.put(url, auth=self.auth_pk, json=data, headers=h_post)
-        return self.rtn(res)
+        return self.send("PUT", url, data=data, headers=headers)
 
-    @catch_connection_error
     def put(self, url="", data=None):
         url = self.get_full_url(url)
-        res = requests.put(url, auth=self.auth_pk, json=data, headers=self.h_post)
-        return self.rtn(res)
+        return self.send("PUT", url, json=data, headers=self.h_post)
 
-    @catch_connection_error
     def delete(self, url="", data=None):
         url = self.get_full_url(url)
-        res = requests.delete(url, auth=self.auth_pk, json=data, headers=self.h_post)
-        return self.rtn(res)
+        return self.send("DELETE", url, json=data, headers=self.h_post)
 
     def get_full_url(self, additional_url=""):
         """
@@ -89,9 +245,6 @@ class Requester(object):
         if additional_url and not str(additional_url).startswith("/"):
             additional_url = "/{}".format(additional_url)
 
-        if self.json_output:
-            self.query_components.append("format=json")
-
         ret = "{base_url}{api_url}{additional_url}".format(
             base_url=self.base_url, api_url=self.API_URL, additional_url=additional_url)
 
@@ -100,6 +253,58 @@ class Requester(object):
         return ret
 
 
+async def iter_async_content(data, chunk_size=UPLOAD_CHUNK_SIZE):
+    """ Iterate asynchronously over binary file object or iterable of bytes """
+    if hasattr(data, "read"):
+        chunk = data.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = data.read(chunk_size)
+    else:
+        for chunk in data:
+            yield chunk
+
+
+class AsyncRequester(Requester):
+    """
+    Requester sending requests through httpx.AsyncClient
+
+    Request building and response parsing are inherited, only sending differs:
+    every request method returns a coroutine.
+    """
+
+    def __init__(self, endpoint, user, passwd, json_output=False, session=None):
+        session = session if session is not None else build_async_client()
+        super(AsyncRequester, self).__init__(endpoint, user, passwd,
+                                             json_output=json_output, session=session)
+
+    def close(self):
+        """ Close all pooled connections of requester client, returns coroutine """
+        return self.session.aclose()
+
+    @catch_async_connection_error
+    async def send(self, method, url, handler=None, **kwargs):
+        params = kwargs.pop("params", None)
+        if params:
+            # requests skips params with None value, httpx would send them empty
+            kwargs["params"] = {key: value for key, value in params.items() if value is not None}
+        data = kwargs.get("data")
+        if isinstance(data, (bytes, str)) or hasattr(data, "__aiter__"):
+            kwargs["content"] = kwargs.pop("data")
+        elif data is not None and not isinstance(data, dict):
+            # httpx.AsyncClient can't send synchronous streams
+            kwargs["content"] = iter_async_content(kwargs.pop("data"))
+            if hasattr(data, "read"):
+                content_length = super_len(data)
+                if content_length:
+                    kwargs["headers"] = dict(kwargs.get("headers") or {},
+                                             **{"Content-Length": str(content_length)})
+        stream = kwargs.pop("stream", False)
+        request = self.session.build_request(method, url, **kwargs)
+        res = await self.session.send(request, auth=self.auth_pk, stream=stream)
+        return (handler or self.rtn)(res)
+
+
 class OCSRequester(Requester):
     """ Requester for OCS API """
 
@@ -114,57 +319,100 @@ class WebDAVRequester(Requester):
     def __init__(self, *args, **kwargs):
         super(WebDAVRequester, self).__init__(*args, **kwargs)
 
-    def rtn(self, resp, data=None):
-        return WebDAVResponse(response=resp, data=data)
+    def rtn(self, resp, data=None, stream=False):
+        if stream:
+            resp = StreamedResponse(resp)
+        return WebDAVResponse(response=resp, data=data, stream=stream)
 
-    @catch_connection_error
-    def propfind(self, additional_url="", headers=None, data=None):
+    def propfind(self, additional_url="", headers=None, data=None, stream=False):
         url = self.get_full_url(additional_url=additional_url)
-        res = requests.request('PROPFIND', url, auth=self.auth_pk, headers=headers, data=data)
-        return self.rtn(res)
+        if stream:
+            return self.send("PROPFIND", url, handler=lambda res: self.rtn(resp=res, stream=True),
+                             headers=headers, data=data, stream=True)
+        return self.send("PROPFIND", url, headers=headers, data=data)
 
-    @catch_connection_error
     def proppatch(self, additional_url="", data=None):
         url = self.get_full_url(additional_url=additional_url)
-        res = requests.request('PROPPATCH', url, auth=self.auth_pk, data=data)
-        return self.rtn(resp=res)
+        return self.send("PROPPATCH", url, data=data)
 
-    @catch_connection_error
-    def report(self, additional_url="", data=None):
+    def report(self, additional_url="", data=None, headers=None):
         url = self.get_full_url(additional_url=additional_url)
-        res = requests.request('REPORT', url, auth=self.auth_pk, data=data)
-        return self.rtn(resp=res)
+        return self.send("REPORT", url, headers=headers, data=data)
 
-    @catch_connection_error
-    def download(self, url="", params=None):
-        url = self.get_full_url(url)
-        res = requests.get(url, auth=self.auth_pk, headers=self.h_get, params=params)
-        return self.rtn(resp=res, data=res.content)
+    def post_data(self, additional_url="", data=None, headers=None):
+        url = self.get_full_url(additional_url=additional_url)
+        return self.send("POST", url, headers=headers, data=data)
 
-    @catch_connection_error
-    def make_collection(self, additional_url=""):
+    def search(self, additional_url="", data=None):
         url = self.get_full_url(additional_url=additional_url)
-        res = requests.request("MKCOL", url=url, auth=self.auth_pk)
-        return self.rtn(resp=res)
+        return self.send("SEARCH", url, headers={"Content-Type": "text/xml"}, data=data)
 
-    @catch_connection_error
-    def move(self, url, destination, overwrite=False):
+    def download(self, url="", params=None, stream=False, headers=None):
+        """
+        Download file
+
+        If stream is True, response body isn't read, response.raw has to be
+        iterated over and closed by caller.
+        """
+        url = self.get_full_url(url)
+        headers = dict(self.h_get, **(headers or {}))
+        if stream:
+            return self.send("GET", url, handler=lambda res: self.rtn(resp=res, stream=True),
+                             headers=headers, params=params, stream=True)
+        return self.send("GET", url, handler=lambda res: self.rtn(resp=res, data=res.content),
+                         headers=headers, params=params)
+
+    def make_collection(self, additional_url="", headers=None):
+        url = self.get_full_url(additional_url=additional_url)
+        return self.send("MKCOL", url, headers=headers)
+
+    def put_chunk(self, url, data, destination, total_length=None):
+        """
+        Upload chunk of chunked upload
+
+        Args:
+            url (str): chunk url, relative to API_URL
+            data (bytes/file object/iterable): chunk contents
+            destination (str): path of assembled file, relative to API_URL or full url
+            total_length (int): (optional) size of assembled file
+        """
         url = self.get_full_url(additional_url=url)
-        destination_url = self.get_full_url(additional_url=destination)
         headers = {
+            "Destination": self.get_destination_url(destination).encode('utf-8'),
+            "Content-Type": "application/octet-stream"
+        }
+        if total_length is not None:
+            headers["OC-Total-Length"] = str(total_length)
+        return self.send("PUT", url, data=data, headers=headers)
+
+    def move(self, url, destination, overwrite=False, headers=None):
+        url = self.get_full_url(additional_url=url)
+        destination_url = self.get_destination_url(destination)
+        headers = dict(headers or {}, **{
             "Destination": destination_url.encode('utf-8'),
             "Overwrite": "T" if overwrite else "F"
-        }
-        res = requests.request("MOVE", url=url, auth=self.auth_pk, headers=headers)
-        return self.rtn(resp=res)
+        })
+        return self.send("MOVE", url, headers=headers)
 
-    @catch_connection_error
     def copy(self, url, destination, overwrite=False):
         url = self.get_full_url(additional_url=url)
-        destination_url = self.get_full_url(additional_url=destination)
+        destination_url = self.get_destination_url(destination)
         headers = {
             "Destination": destination_url.encode('utf-8'),
             "Overwrite": "T" if overwrite else "F"
         }
-        res = requests.request("COPY", url=url, auth=self.auth_pk, headers=headers)
-        return self.rtn(resp=res)
+        return self.send("COPY", url, headers=headers)
+
+    def get_destination_url(self, destination):
+        """ Build full url of Destination header, unless destination is full url already """
+        if str(destination).startswith(("http://", "https://")):
+            return destination
+        return self.get_full_url(additional_url=destination)
+
+
+class AsyncOCSRequester(AsyncRequester, OCSRequester):
+    """ Asynchronous requester for OCS API """
+
+
+class AsyncWebDAVRequester(AsyncRequester, WebDAVRequester):
+    """ Asynchronous requester for WebDAV API """
@@ -18,18 +18,26 @@ class WebDAVResponse(NextCloudResponse):
     """ Response class for WebDAV api methods """
 
     METHODS_SUCCESS_CODES = {
+        "GET": [WebDAVStatusCodes.OK_CODE, WebDAVStatusCodes.PARTIAL_CONTENT_CODE],
         "PROPFIND": [WebDAVStatusCodes.MULTISTATUS_CODE],
         "PROPPATCH": [WebDAVStatusCodes.MULTISTATUS_CODE],
         "REPORT": [WebDAVStatusCodes.MULTISTATUS_CODE],
+        "SEARCH": [WebDAVStatusCodes.MULTISTATUS_CODE],
         "MKCOL": [WebDAVStatusCodes.CREATED_CODE],
         "COPY": [WebDAVStatusCodes.CREATED_CODE, WebDAVStatusCodes.NO_CONTENT_CODE],
         "MOVE": [WebDAVStatusCodes.CREATED_CODE, WebDAVStatusCodes.NO_CONTENT_CODE],
-        "PUT": [WebDAVStatusCodes.CREATED_CODE],
+        "PUT": [WebDAVStatusCodes.CREATED_CODE, WebDAVStatusCodes.NO_CONTENT_CODE],
+        "POST": [WebDAVStatusCodes.OK_CODE],
         "DELETE": [WebDAVStatusCodes.NO_CONTENT_CODE]
     }
 
-    def __init__(self, response, data=None):
-        super(WebDAVResponse, self).__init__(response=response, data=data, json_output=False)
+    def __init__(self, response, data=None, stream=False):
+        if stream:
+            # body is left unread, to be consumed by iterating over raw response
+            self.raw = response
+            self.data = None
+        else:
+            super(WebDAVResponse, self).__init__(response=response, data=data, json_output=False)
         request_method = response.request.method
         self.is_ok = False
         if request_method in self.METHODS_SUCCESS_CODES:
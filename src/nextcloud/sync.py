@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote
+
+from .api_wrappers.webdav import DEFAULT_MAX_WORKERS, WebDAV, timestamp_to_epoch_time
+from .index import RemoteIndex, is_collection
+
+STATE_FILE_NAME = ".nextcloud_sync.db"
+PART_FILE_SUFFIX = ".nextcloud_sync.part"
+
+
+class SyncMode(object):
+    PUSH = "push"
+    PULL = "pull"
+    BIDIRECTIONAL = "bidirectional"
+
+
+class SyncAction(object):
+    """ Transfer (or other change) needed to sync single file, and its outcome """
+
+    UPLOAD = "upload"
+    DOWNLOAD = "download"
+    DELETE_REMOTE = "delete_remote"
+    DELETE_LOCAL = "delete_local"
+    CONFLICT = "conflict"
+
+    def __init__(self, action, path):
+        self.action = action
+        self.path = path
+        self.result = None
+        self.exception = None
+
+    @property
+    def is_ok(self):
+        """ Action was done successfully, conflicts are never ok """
+        if self.action == self.CONFLICT or self.exception is not None:
+            return False
+        return getattr(self.result, 'is_ok', True) is not False
+
+    def __repr__(self):
+        is_ok_str = "OK" if self.is_ok else "Failed"
+        return "<SyncAction: {} {}: {}>".format(self.action, self.path, is_ok_str)
+
+
+class DirectorySync(object):
+    """
+    Sync local directory with Nextcloud folder of user
+
+    State of every synced file (local mtime, size and inode, remote etag) is
+    kept in SQLite database, so only files changed since previous sync are
+    transferred, unchanged files cost no requests. Remote changes are found
+    with RemoteIndex, kept in the same database: if nothing changed in
+    Nextcloud, that costs one PROPFIND request. In push mode remote folder
+    isn't listed at all.
+
+    Modes:
+        push: local changes are uploaded, files deleted locally are deleted in Nextcloud
+        pull: remote changes are downloaded, files deleted in Nextcloud are deleted locally
+        bidirectional: changes of both sides are synced, files changed on both
+            sides since previous sync are reported as conflicts and left as they are
+
+    Modified times are kept in both directions. Only files are synced, empty
+    folders are not.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS synced (
+            path TEXT PRIMARY KEY,
+            mtime INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            etag TEXT
+        );
+    """
+
+    def __init__(self, nxc, uid, local_dir, remote_dir, mode=SyncMode.BIDIRECTIONAL,
+                 state_path=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Args:
+            nxc (NextCloud): client to sync with
+            uid (str): uid of user
+            local_dir (str): path of local directory
+            remote_dir (str): path of Nextcloud folder
+            mode (str): one of SyncMode values
+            state_path (str): (optional) path of state database, by default it's
+                kept in local directory (and isn't synced)
+            max_workers (int): number of transfers run at once
+        """
+        if mode not in (SyncMode.PUSH, SyncMode.PULL, SyncMode.BIDIRECTIONAL):
+            raise ValueError("Unknown sync mode: {}".format(mode))
+        self._nxc = nxc
+        self.uid = uid
+        self.local_dir = local_dir
+        self.remote_dir = remote_dir.strip("/")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.state_path = state_path or os.path.join(local_dir, STATE_FILE_NAME)
+        os.makedirs(local_dir, exist_ok=True)
+        self._connection = sqlite3.connect(self.state_path)
+        self._connection.executescript(self.SCHEMA)
+        self._index = RemoteIndex(nxc, uid, self.state_path, path=self.remote_dir,
+                                  max_workers=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._index.close()
+        self._connection.close()
+
+    def run(self):
+        """
+        Sync directory
+
+        Returns:
+            list of SyncAction, one for every file which needed syncing
+        """
+        synced = {path: (mtime, size, inode, etag) for path, mtime, size, inode, etag
+                  in self._connection.execute("SELECT path, mtime, size, inode, etag FROM synced")}
+        if not synced and self.mode != SyncMode.PULL:
+            self._nxc.assure_tree_exists(self.uid, self.remote_dir)
+        local_files = self._scan_local_files()
+        if self.mode == SyncMode.PUSH:
+            remote_files, remote_folders = {}, None
+        else:
+            remote_files, remote_folders = self._scan_remote_files()
+
+        actions = []
+        for path in sorted(set(local_files) | set(remote_files) | set(synced)):
+            local_file, remote_file = local_files.get(path), remote_files.get(path)
+            action = self._get_action(local_file, remote_file, synced.get(path))
+            if action is not None:
+                actions.append(SyncAction(action, path))
+            elif synced.get(path) is None and local_file and remote_file:
+                # the same file appeared on both sides
+                self._save_state(path, local_file + remote_file[:1])
+
+        self._create_remote_folders([action.path for action in actions
+                                     if action.action == SyncAction.UPLOAD], remote_folders)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._run_action, action, remote_files): action
+                       for action in actions if action.action != SyncAction.CONFLICT}
+            for future in as_completed(futures):
+                action = futures[future]
+                try:
+                    action.result, state = future.result()
+                except Exception as e:
+                    action.exception = e
+                    continue
+                if action.is_ok:
+                    self._save_state(action.path, state)
+        return actions
+
+    def _get_action(self, local_file, remote_file, synced_file):
+        """ Get action needed to sync file, None if file is in sync """
+        local_changed = local_file != (synced_file[:3] if synced_file else None)
+        if self.mode == SyncMode.PUSH:
+            if not local_changed:
+                return None
+            return SyncAction.UPLOAD if local_file else SyncAction.DELETE_REMOTE
+
+        remote_etag = remote_file[0] if remote_file else None
+        remote_changed = remote_etag != (synced_file[3] if synced_file else None)
+        if self.mode == SyncMode.PULL:
+            if not remote_changed:
+                return None
+            return SyncAction.DOWNLOAD if remote_file else SyncAction.DELETE_LOCAL
+
+        if local_changed and remote_changed:
+            if not local_file and not remote_file:
+                # deleted on both sides, only state is removed
+                return SyncAction.DELETE_LOCAL
+            if (local_file and remote_file and synced_file is None
+                    and local_file[:2] == remote_file[1:]):
+                return None
+            return SyncAction.CONFLICT
+        if local_changed:
+            return SyncAction.UPLOAD if local_file else SyncAction.DELETE_REMOTE
+        if remote_changed:
+            return SyncAction.DOWNLOAD if remote_file else SyncAction.DELETE_LOCAL
+        return None
+
+    def _run_action(self, action, remote_files):
+        """ Do action, return its result and new state of synced file (None if it's deleted) """
+        local_path = self._get_local_path(action.path)
+        remote_path = self._get_remote_path(action.path)
+        if action.action == SyncAction.UPLOAD:
+            stat = os.stat(local_path)
+            res = self._nxc.upload_file(self.uid, local_path, remote_path,
+                                        timestamp=int(stat.st_mtime))
+            return res, self._get_local_state(stat) + (res.raw.headers.get('ETag'),)
+        if action.action == SyncAction.DOWNLOAD:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            part_path = local_path + PART_FILE_SUFFIX
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            self._nxc.download_file(self.uid, remote_path, part_path)
+            os.replace(part_path, local_path)
+            return None, self._get_local_state(os.stat(local_path)) + (remote_files[action.path][0],)
+        if action.action == SyncAction.DELETE_REMOTE:
+            res = self._nxc.delete_path(self.uid, remote_path)
+            if res.raw.status_code == 404:
+                # already deleted
+                res = None
+            return res, None
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        return None, None
+
+    def _save_state(self, path, state):
+        with self._connection:
+            if state is None:
+                self._connection.execute("DELETE FROM synced WHERE path = ?", (path,))
+            else:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO synced (path, mtime, size, inode, etag) "
+                    "VALUES (?, ?, ?, ?, ?)", (path,) + state)
+
+    def _scan_local_files(self):
+        """ Get local files by path relative to local directory, values are (mtime, size, inode) """
+        state_path = os.path.abspath(self.state_path)
+        local_files = {}
+        for dirpath, dirs, files in os.walk(self.local_dir):
+            for name in files:
+                local_path = os.path.join(dirpath, name)
+                if os.path.abspath(local_path).startswith(state_path) or name.endswith(PART_FILE_SUFFIX):
+                    # state database with its journal and unfinished downloads
+                    continue
+                path = os.path.relpath(local_path, self.local_dir).replace(os.sep, "/")
+                local_files[path] = self._get_local_state(os.stat(local_path))
+        return local_files
+
+    def _scan_remote_files(self):
+        """
+        Get remote files by path relative to remote folder, values are
+        (etag, mtime, size), and set of remote folders paths
+        """
+        self._index.refresh()
+        user_url = "{}/{}/".format(WebDAV.API_URL, self.uid)
+        remote_dir = "{}/".format(self.remote_dir) if self.remote_dir else ""
+        remote_files, remote_folders = {}, set()
+        for file_dict in self._index:
+            path = unquote(file_dict['href']).partition(user_url)[2].strip("/")
+            if not path.startswith(remote_dir) or path == self.remote_dir:
+                continue
+            path = path[len(remote_dir):]
+            if is_collection(file_dict):
+                remote_folders.add(path)
+                continue
+            remote_files[path] = (file_dict.get('etag'),
+                                  timestamp_to_epoch_time(file_dict.get('last_modified')),
+                                  int(file_dict.get('content_length') or 0))
+        return remote_files, remote_folders
+
+    def _create_remote_folders(self, uploaded_paths, remote_folders=None):
+        """ Create remote folders of uploaded files, which aren't known to exist """
+        folders = {path.rpartition("/")[0] for path in uploaded_paths} - {""}
+        folders -= remote_folders or set()
+        for folder in sorted(folders):
+            if not any(other.startswith(folder + "/") for other in folders):
+                self._nxc.assure_tree_exists(self.uid, self._get_remote_path(folder))
+
+    @staticmethod
+    def _get_local_state(stat):
+        return int(stat.st_mtime), stat.st_size, stat.st_ino
+
+    def _get_local_path(self, path):
+        return os.path.join(self.local_dir, *path.split("/"))
+
+    def _get_remote_path(self, path):
+        return "/".join([self.remote_dir, path]) if self.remote_dir else path
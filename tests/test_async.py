@@ -0,0 +1,189 @@
+import asyncio
+import inspect
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from nextcloud import NextCloud, AsyncNextCloud
+from nextcloud.requester import NextCloudConnectionError
+from .base import BaseTestCase, NEXTCLOUD_URL, NEXTCLOUD_USERNAME, NEXTCLOUD_PASSWORD
+
+httpx = pytest.importorskip("httpx")
+
+
+class TestAsyncNextCloud(BaseTestCase):
+
+    def get_async_nxc(self, url=NEXTCLOUD_URL):
+        return AsyncNextCloud(url, NEXTCLOUD_USERNAME, NEXTCLOUD_PASSWORD, json_output=True)
+
+    def get_api_methods(self, nxc):
+        return {name
+                for api_class in nxc.functionality_classes for name in dir(api_class)
+                if not name.startswith('_') and callable(getattr(api_class, name))}
+
+    def test_same_api_methods(self):
+        async_nxc = self.get_async_nxc()
+        assert self.get_api_methods(self.nxc) == self.get_api_methods(async_nxc)
+        for method_name in self.get_api_methods(async_nxc):
+            method = getattr(async_nxc, method_name)
+            assert (inspect.iscoroutinefunction(method)
+                    or inspect.isasyncgenfunction(method)), method_name
+
+    def test_sync_only_methods(self):
+        # facade methods of NextCloud, which aren't api methods, are either listed
+        # as sync only or implemented by AsyncNextCloud too
+        facade_methods = {name for name in vars(NextCloud)
+                          if not name.startswith('_') and callable(getattr(NextCloud, name))}
+        async_facade_methods = {name for name in vars(AsyncNextCloud) if not name.startswith('_')
+                                and callable(getattr(AsyncNextCloud, name))}
+        assert facade_methods - async_facade_methods == set(AsyncNextCloud.SYNC_ONLY_METHODS)
+
+    def test_wrong_url(self):
+        async def get_user():
+            async with self.get_async_nxc(url='http://wrong-url.wrong') as nxc:
+                await nxc.get_user(self.username)
+
+        with pytest.raises(NextCloudConnectionError):
+            asyncio.run(get_user())
+
+    def test_concurrent_requests(self):
+        async def get_responses():
+            async with self.get_async_nxc() as nxc:
+                return await asyncio.gather(
+                    nxc.get_users(),
+                    nxc.get_groups(),
+                    nxc.get_capabilities(),
+                    nxc.get_shares(),
+                    *[nxc.get_user(self.username) for _ in range(20)]
+                )
+
+        users, groups, capabilities, shares, *user_responses = asyncio.run(get_responses())
+        assert users.is_ok
+        assert self.username in users.data['users']
+        assert groups.is_ok
+        assert 'admin' in groups.data['groups']
+        assert capabilities.is_ok
+        assert shares.is_ok
+        for res in user_responses:
+            assert res.is_ok
+            assert res.data['id'] == self.username
+
+    def test_webdav(self):
+        async def list_folders():
+            async with self.get_async_nxc() as nxc:
+                return await nxc.list_folders(self.username)
+
+        res = asyncio.run(list_folders())
+        assert res.is_ok
+        assert isinstance(res.data, list)
+        assert isinstance(res.data[0], dict)
+
+    def test_upload_file_chunked(self):
+        file_content = b"chunked upload content " * 500
+        remote_path = "test_async_file_chunked"
+
+        async def upload_and_download(local_path):
+            async with self.get_async_nxc() as nxc:
+                res = await nxc.upload_file_chunked(self.username, local_path, remote_path,
+                                                    chunk_size=1000, max_workers=3)
+                contents = b"".join([chunk async for chunk in nxc.iter_file_contents(
+                    self.username, remote_path)])
+                await nxc.delete_path(self.username, remote_path)
+                return res, contents
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_path = os.path.join(local_dir, "test_file")
+            with open(local_path, "wb") as f:
+                f.write(file_content)
+            res, contents = asyncio.run(upload_and_download(local_path))
+        assert res.is_ok
+        assert contents == file_content
+
+    def test_download_file_parallel(self):
+        file_content = b"parallel download content " * 500
+        remote_path = "test_async_file_parallel"
+
+        async def upload_and_download(local_path):
+            async with self.get_async_nxc() as nxc:
+                await nxc.upload_file_contents(self.username, file_content, remote_path)
+                await nxc.download_file_parallel(self.username, remote_path, local_path,
+                                                 range_size=1000, max_workers=3)
+                await nxc.delete_path(self.username, remote_path)
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_path = os.path.join(local_dir, "test_file")
+            asyncio.run(upload_and_download(local_path))
+            with open(local_path, "rb") as f:
+                assert f.read() == file_content
+            assert not os.path.exists(local_path + ".part.journal")
+
+    def test_download_folder_archive_extract(self):
+        folder_name = "test_async_folder_archive"
+
+        async def upload_and_extract(extract_dir):
+            async with self.get_async_nxc() as nxc:
+                await nxc.assure_tree_exists(self.username, folder_name + "/sub")
+                await nxc.upload_file_contents(self.username, b"content",
+                                               folder_name + "/sub/test_file")
+                try:
+                    await nxc.download_folder_archive(self.username, folder_name, extract_dir,
+                                                      extract=True)
+                finally:
+                    await nxc.delete_path(self.username, folder_name)
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            try:
+                asyncio.run(upload_and_extract(local_dir))
+            except ValueError:
+                self.skipTest("Server doesn't serve archives of folders over WebDAV")
+            file_paths = [os.path.join(dirpath, name)
+                          for dirpath, _, files in os.walk(local_dir) for name in files]
+            assert len(file_paths) == 1
+            with open(file_paths[0], "rb") as f:
+                assert f.read() == b"content"
+
+    def test_iter_file_contents_connection_lost(self):
+        remote_path = "test_async_file_streaming_lost"
+
+        async def broken_aiter_bytes(response, chunk_size=None):
+            yield b"content"
+            raise httpx.ReadError("Connection broken")
+
+        async def upload_and_download():
+            async with self.get_async_nxc() as nxc:
+                await nxc.upload_file_contents(self.username, b"content" * 1000, remote_path)
+                try:
+                    with patch.object(httpx.Response, 'aiter_bytes', broken_aiter_bytes):
+                        return [chunk async for chunk in nxc.iter_file_contents(
+                            self.username, remote_path)]
+                finally:
+                    await nxc.delete_path(self.username, remote_path)
+
+        with pytest.raises(NextCloudConnectionError):
+            asyncio.run(upload_and_download())
+
+    def test_bulk_upload(self):
+        files = [(b"content %d" % idx, "test_async_bulk_upload/test_file_{}".format(idx))
+                 for idx in range(5)]
+
+        async def upload_and_download():
+            async with self.get_async_nxc() as nxc:
+                results = await nxc.bulk_upload(self.username, files, max_files=2)
+                contents = b"".join([chunk async for chunk in nxc.iter_file_contents(
+                    self.username, files[3][1])])
+                await nxc.delete_path(self.username, "test_async_bulk_upload")
+                return results, contents
+
+        results, contents = asyncio.run(upload_and_download())
+        assert [res.remote_filepath for res in results] == [each[1] for each in files]
+        assert all(res.is_ok for res in results)
+        assert contents == files[3][0]
+
+    def test_create_share_invalid_parameters(self):
+        async def create_share():
+            async with self.get_async_nxc() as nxc:
+                return await nxc.create_share(None, None)
+
+        assert asyncio.run(create_share()) is False
@@ -27,3 +27,20 @@ def test_ok():
             base.NEXTCLOUD_USERNAME, base.NEXTCLOUD_PASSWORD)
     issues = nxc.get_connection_issues()
     assert not issues
+
+
+def test_shared_connection_pool():
+    nxc = base.NextCloud("foo", "bar", "baz", pool_connections=2, pool_maxsize=4)
+    sessions = {api_class._requester.session for api_class in nxc.functionality_classes}
+    assert sessions == {nxc.session}
+    adapter = nxc.session.get_adapter("https://foo")
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 4
+
+
+def test_context_manager():
+    with base.NextCloud(
+            base.NEXTCLOUD_URL,
+            base.NEXTCLOUD_USERNAME, base.NEXTCLOUD_PASSWORD) as nxc:
+        assert not nxc.get_connection_issues()
+        assert nxc.get_user(base.NEXTCLOUD_USERNAME).is_ok
@@ -0,0 +1,43 @@
+from .base import BaseTestCase
+
+
+class TestBatch(BaseTestCase):
+
+    def setUp(self):
+        super(TestBatch, self).setUp()
+        self.group_name = self.get_random_string(length=4) + "_test_batch"
+        self.nxc.add_group(self.group_name)
+
+    def tearDown(self):
+        self.nxc.delete_group(self.group_name)
+
+    def test_batch_failures_dont_abort_batch(self):
+        batch = self.nxc.batch(max_workers=2)
+        assert batch.edit_user("some_user", "wrong_field", "value") == 0
+        assert batch.create_share(None, None) == 1
+        results = batch.run()
+        assert len(results) == 2
+        assert isinstance(results[0].exception, AssertionError)
+        assert results[1].exception is None
+        assert not any(res.is_ok for res in results)
+        assert len(batch) == 0
+
+    def test_batch(self):
+        user_ids = ["batch_user_" + self.get_random_string(length=4) for _ in range(10)]
+        with self.nxc.batch(max_workers=4) as batch:
+            for user_id in user_ids:
+                batch.add_user(user_id, self.get_random_string(length=8))
+        assert len(batch.results) == len(user_ids)
+        assert all(res.is_ok for res in batch.results)
+        assert [res.args[0] for res in batch.results] == user_ids
+
+        with self.nxc.batch(max_workers=4) as batch:
+            for user_id in user_ids:
+                batch.add_to_group(user_id, self.group_name)
+            batch.add_to_group(user_ids[0], self.group_name + "_nonexistent")
+        assert all(res.is_ok for res in batch.results[:-1])
+        assert not batch.results[-1].is_ok
+        group_users = self.nxc.get_group(self.group_name).data['users']
+        assert sorted(group_users) == sorted(user_ids)
+
+        self.clear(user_ids=user_ids)
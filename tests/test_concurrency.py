@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import BaseTestCase
+from nextcloud.api_wrappers import User, Group, Capabilities, Share
+
+
+class TestConcurrency(BaseTestCase):
+
+    def test_api_wrappers_have_own_requesters(self):
+        requesters = [api_class.requester for api_class in self.nxc.functionality_classes]
+        assert len({id(requester) for requester in requesters}) == len(requesters)
+        for api_class in self.nxc.functionality_classes:
+            assert api_class.requester.API_URL == api_class.API_URL
+
+    def test_concurrent_calls_to_several_endpoints(self):
+        calls = [
+            (self.nxc.get_users, User.API_URL),
+            (self.nxc.get_groups, Group.API_URL),
+            (self.nxc.get_capabilities, Capabilities.API_URL),
+            (self.nxc.get_shares, Share.API_URL),
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [(executor.submit(method), api_url)
+                       for _ in range(25) for method, api_url in calls]
+            for future, api_url in futures:
+                res = future.result()
+                # success code is checked against code of the called endpoint
+                assert res.is_ok
+                assert api_url in res.raw.url
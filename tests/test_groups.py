@@ -26,6 +26,12 @@ class TestGroups(BaseTestCase):
         res = self.nxc.get_groups(limit=0)
         assert len(res.data['groups']) == 0
 
+    def test_iter_groups(self):
+        groups = self.nxc.get_groups().data['groups']
+        assert self.group_name in groups
+        assert list(self.nxc.iter_groups(page_size=1)) == groups
+        assert list(self.nxc.iter_groups(page_size=2, prefetch=0)) == groups
+
     def test_add_get_group(self):
         group_name = self.get_random_string(length=4) + "_test_add"
         res = self.nxc.add_group(group_name)
@@ -52,3 +58,37 @@ class TestGroups(BaseTestCase):
         res = self.nxc.get_subadmins(self.group_name)
         assert res.is_ok
         assert res.data == [self.user_username]
+
+    def test_iter_group_members(self):
+        self.nxc.add_to_group(self.user_username, self.group_name)
+        members = list(self.nxc.iter_group_members(self.group_name, page_size=1))
+        assert [each.id for each in members] == [self.user_username]
+        assert list(self.nxc.iter_group_members(self.group_name, details=False)) == [
+            self.user_username]
+
+    def test_membership_matrix(self):
+        self.nxc.add_to_group(self.user_username, self.group_name)
+        self.nxc.create_subadmin(self.user_username, self.group_name)
+        matrix = self.nxc.membership_matrix(max_workers=4)
+        assert matrix.group_users[self.group_name] == {self.user_username}
+        assert self.group_name in matrix.user_groups[self.user_username]
+        assert self.username in matrix.group_users["admin"]
+        assert matrix.group_subadmins[self.group_name] == {self.user_username}
+        assert matrix.user_subadmin_groups[self.user_username] == {self.group_name}
+
+    def test_reconcile_memberships(self):
+        other_username = self.create_new_user('user_group_')
+        self.nxc.add_to_group(self.user_username, self.group_name)
+        desired = {self.group_name: {other_username}}
+
+        plan = self.nxc.reconcile_memberships(desired, dry_run=True)
+        assert [(change.action, change.uid) for change in plan] == [
+            ("add", other_username), ("remove", self.user_username)]
+        assert self.nxc.get_group(self.group_name).data['users'] == [self.user_username]
+
+        changes = self.nxc.reconcile_memberships(desired)
+        assert all(change.is_ok for change in changes)
+        assert self.nxc.get_group(self.group_name).data['users'] == [other_username]
+        assert self.nxc.reconcile_memberships(desired) == []
+
+        self.delete_user(other_username)
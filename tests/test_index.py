@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+from .base import BaseTestCase, LocalNxcUserMixin
+
+
+class TestRemoteIndex(LocalNxcUserMixin, BaseTestCase):
+
+    def setUp(self):
+        super(TestRemoteIndex, self).setUp()
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.db_dir.name, "index.db")
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+        super(TestRemoteIndex, self).tearDown()
+
+    def test_refresh(self):
+        folder_name = "test_index"
+        self.nxc_local.create_folder(self.user_username, folder_name)
+        self.nxc_local.create_folder(self.user_username, folder_name + "/sub")
+        self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                            folder_name + "/sub/test_file")
+
+        with self.nxc_local.remote_index(self.user_username, self.db_path, folder_name) as index:
+            changes = index.refresh()
+            assert len(changes.added) == 3
+            assert len(index) == 3
+            file_href = [href for href in changes.added if href.endswith("test_file")][0]
+            assert index.get(file_href)['href'] == file_href
+
+            assert not index.refresh()
+
+            self.nxc_local.upload_file_contents(self.user_username, b"new content",
+                                                folder_name + "/sub/test_file")
+            self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                                folder_name + "/test_file_2")
+            changes = index.refresh()
+            assert changes.modified == [file_href]
+            assert len(changes.added) == 1 and changes.added[0].endswith("test_file_2")
+
+            self.nxc_local.delete_path(self.user_username, folder_name + "/sub")
+            changes = index.refresh()
+            assert len(changes.removed) == 2
+            assert index.get(file_href) is None
+            assert len(index) == 2
+
+        # index is persistent
+        with self.nxc_local.remote_index(self.user_username, self.db_path, folder_name) as index:
+            assert len(index) == 2
+            assert not index.refresh()
+
+        self.nxc_local.delete_path(self.user_username, folder_name)
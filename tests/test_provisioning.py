@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from .base import BaseTestCase, NEXTCLOUD_URL, NEXTCLOUD_USERNAME, NEXTCLOUD_PASSWORD
+from nextcloud.provisioning import ProvisioningResult, read_records, quota_to_bytes, main
+
+
+class TestProvisioning(BaseTestCase):
+
+    def setUp(self):
+        super(TestProvisioning, self).setUp()
+        self.group_name = self.get_random_string(length=4) + "_test_provisioning"
+        self.nxc.add_group(self.group_name)
+        self.user_ids = [self.get_random_string(length=4) + "_test_provisioning_{}".format(idx)
+                         for idx in range(3)]
+
+    def tearDown(self):
+        for uid in self.user_ids:
+            self.nxc.delete_user(uid)
+        self.nxc.delete_group(self.group_name)
+
+    def test_provision_users(self):
+        records = io.StringIO("uid,password,displayname,groups,subadmin\n" + "".join(
+            "{},{},User {},{},{}\n".format(uid, self.get_random_string(length=12), idx,
+                                           self.group_name, self.group_name if idx == 0 else "")
+            for idx, uid in enumerate(self.user_ids)))
+        log_file = io.StringIO()
+        results = self.nxc.provision_users(read_records(records, "csv"), log_file=log_file)
+        assert sorted(res.uid for res in results) == sorted(self.user_ids)
+        assert all(res.status == ProvisioningResult.CREATED for res in results)
+        assert len(log_file.getvalue().splitlines()) == len(self.user_ids)
+        assert json.loads(log_file.getvalue().splitlines()[0])['status'] == "created"
+
+        assert sorted(self.nxc.get_group(self.group_name).data['users']) == sorted(self.user_ids)
+        assert self.nxc.get_subadmins(self.group_name).data == [self.user_ids[0]]
+
+        # provisioning is idempotent
+        records.seek(0)
+        results = self.nxc.provision_users(read_records(records, "csv"))
+        assert all(res.status == ProvisioningResult.UNCHANGED for res in results)
+
+    def test_main_stdin(self):
+        credentials = ["--endpoint", NEXTCLOUD_URL, "--user", NEXTCLOUD_USERNAME,
+                       "--password", NEXTCLOUD_PASSWORD]
+        records = "".join(json.dumps({"uid": uid, "password": self.get_random_string(length=12),
+                                      "groups": [self.group_name]}) + "\n"
+                          for uid in self.user_ids)
+
+        # format can't be guessed without file name
+        with patch("sys.stdin", io.StringIO(records)):
+            with self.assertRaises(SystemExit):
+                main(["-"] + credentials)
+        assert not self.nxc.get_group(self.group_name).data['users']
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            log_path = os.path.join(log_dir, "results.ndjson")
+            with patch("sys.stdin", io.StringIO(records)):
+                assert main(["-", "--format", "ndjson", "--log", log_path] + credentials) == 0
+            with open(log_path) as f:
+                assert sorted(json.loads(line)['uid'] for line in f) == sorted(self.user_ids)
+        assert sorted(self.nxc.get_group(self.group_name).data['users']) == sorted(self.user_ids)
+
+
+def test_quota_to_bytes():
+    assert quota_to_bytes("5 GB") == quota_to_bytes("5GiB") == quota_to_bytes("5 gib") == \
+        5 * 1024 ** 3
+    assert quota_to_bytes("1.5 MiB") == quota_to_bytes("1.5m") == int(1.5 * 1024 ** 2)
+    assert quota_to_bytes(1024) == quota_to_bytes("1024") == 1024
+    assert quota_to_bytes("5 XiB") is None
+
+
+def test_read_records_ndjson():
+    records = list(read_records(io.StringIO('{"id": 1001, "groups": ["staff", 7]}\n\n'
+                                            '{"uid": "jdoe", "groups": "a; b", "quota": "1 GB"}\n'),
+                                "ndjson"))
+    assert [record["uid"] for record in records] == ["1001", "jdoe"]
+    assert [record["groups"] for record in records] == [["staff", "7"], ["a", "b"]]
+    assert records[1]["quota"] == "1 GB"
+
+
+def test_read_records_unknown_format():
+    # format is checked before file is read
+    with pytest.raises(ValueError):
+        read_records("users.txt")
+    with pytest.raises(ValueError):
+        read_records("users.csv", "xml")
+    # command fails with usage error before connecting
+    with pytest.raises(SystemExit):
+        main(["users.txt", "--endpoint", "http://localhost:1", "--user", "admin",
+              "--password", "admin"])
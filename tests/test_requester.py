@@ -17,3 +17,22 @@ class TestRequester(TestCase):
             assert wrong_url in str(e)
         assert exception_raised
 
+    def test_with_context(self):
+        req = Requester('http://wrong-url.wrong', 'user', 'password', json_output=True)
+        users_req = req.with_context('/users', success_code=100)
+        shares_req = req.with_context('/shares', success_code=200)
+        assert users_req.session is req.session
+        assert req.API_URL is None
+        assert users_req.get_full_url('id') == 'http://wrong-url.wrong/users/id?format=json'
+        assert shares_req.get_full_url('id') == 'http://wrong-url.wrong/shares/id?format=json'
+        assert (users_req.SUCCESS_CODE, shares_req.SUCCESS_CODE) == (100, 200)
+
+    def test_put_with_timestamp_keeps_headers(self):
+        req = Requester('http://wrong-url.wrong', 'user', 'password', json_output=False)
+        req.API_URL = '/wrong'
+        headers = dict(req.h_post)
+        try:
+            req.put_with_timestamp('', data=None, timestamp=1579552860)
+        except NextCloudConnectionError:
+            pass
+        assert req.h_post == headers
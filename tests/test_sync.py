@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+from .base import BaseTestCase, LocalNxcUserMixin
+from nextcloud.sync import SyncAction
+
+
+class TestSync(LocalNxcUserMixin, BaseTestCase):
+
+    def setUp(self):
+        super(TestSync, self).setUp()
+        self.local_dir = tempfile.TemporaryDirectory()
+        self.remote_dir = "test_sync"
+
+    def tearDown(self):
+        self.local_dir.cleanup()
+        super(TestSync, self).tearDown()
+
+    def sync(self, mode="bidirectional", local_dir=None):
+        return self.nxc_local.sync(self.user_username, local_dir or self.local_dir.name,
+                                   self.remote_dir, mode=mode)
+
+    def test_sync(self):
+        local_dir = self.local_dir.name
+        os.makedirs(os.path.join(local_dir, "sub"))
+        file_path = os.path.join(local_dir, "sub", "test_file")
+        with open(file_path, "w") as f:
+            f.write("content")
+        os.utime(file_path, (1500000000, 1500000000))
+
+        actions = self.sync(mode="push")
+        assert [(action.action, action.path) for action in actions] == [
+            (SyncAction.UPLOAD, "sub/test_file")]
+        assert all(action.is_ok for action in actions)
+        assert self.sync(mode="push") == []
+
+        # pull to another directory, modified time is kept
+        with tempfile.TemporaryDirectory() as other_dir:
+            actions = self.sync(mode="pull", local_dir=other_dir)
+            assert [(action.action, action.path) for action in actions] == [
+                (SyncAction.DOWNLOAD, "sub/test_file")]
+            downloaded_path = os.path.join(other_dir, "sub", "test_file")
+            with open(downloaded_path) as f:
+                assert f.read() == "content"
+            assert int(os.path.getmtime(downloaded_path)) == 1500000000
+
+        assert self.sync() == []
+
+        self.nxc_local.upload_file_contents(self.user_username, b"remote content",
+                                            self.remote_dir + "/remote_file")
+        os.remove(file_path)
+        actions = self.sync()
+        assert sorted((action.action, action.path) for action in actions) == [
+            (SyncAction.DELETE_REMOTE, "sub/test_file"), (SyncAction.DOWNLOAD, "remote_file")]
+        assert all(action.is_ok for action in actions)
+        with open(os.path.join(local_dir, "remote_file")) as f:
+            assert f.read() == "remote content"
+        assert self.sync() == []
+
+        self.nxc_local.delete_path(self.user_username, self.remote_dir)
@@ -15,6 +15,27 @@ class TestUsers(BaseTestCase):
         res = self.nxc.get_users(limit=0)
         assert len(res.data['users']) == 0
 
+    def test_iter_users(self):
+        users = self.nxc.get_users().data['users']
+        assert list(self.nxc.iter_users(page_size=1)) == users
+        assert list(self.nxc.iter_users(page_size=2, prefetch=0)) == users
+        assert list(self.nxc.iter_users(search=self.username)) == self.nxc.get_users(
+            search=self.username).data['users']
+
+    def test_iter_users_details(self):
+        res = self.nxc.get_users_details(search=self.username)
+        assert res.is_ok
+        assert res.data['users'][self.username]['id'] == self.username
+
+        users_details = list(self.nxc.iter_users_details(page_size=1))
+        assert [each.id for each in users_details] == self.nxc.get_users().data['users']
+        user_details = [each for each in users_details if each.id == self.username][0]
+        user = self.nxc.get_user(self.username).data
+        assert user_details.enabled == user['enabled']
+        assert user_details.email == user['email']
+        assert user_details.groups == user['groups']
+        assert user_details.as_dict()['display_name'] == user['displayname']
+
     def test_get_user(self):
         res = self.nxc.get_user(self.username)
         assert res.is_ok
@@ -1,10 +1,16 @@
+import io
 import os
+import tempfile
+import zipfile
+import requests
 from requests.utils import quote
 from datetime import datetime
+from unittest.mock import patch
 
 from .base import BaseTestCase, LocalNxcUserMixin
 from nextcloud.api_wrappers import WebDAV
 from nextcloud.api_wrappers.webdav import timestamp_to_epoch_time
+from nextcloud.requester import NextCloudConnectionError
 
 
 class TestWebDAV(LocalNxcUserMixin, BaseTestCase):
@@ -33,6 +39,103 @@ class TestWebDAV(LocalNxcUserMixin, BaseTestCase):
         assert isinstance(res.data, list)
         assert isinstance(res.data[0], dict)
 
+    def test_iter_folder(self):
+        folder_name = "test_iter_folder"
+        self.nxc_local.create_folder(self.user_username, folder_name)
+        file_names = ["test_file_{}".format(idx) for idx in range(5)]
+        for file_name in file_names:
+            self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                                "/".join([folder_name, file_name]))
+
+        listed = self.nxc_local.list_folders(self.user_username, folder_name, all_properties=True)
+        iterated = list(self.nxc_local.iter_folder(self.user_username, folder_name,
+                                                   all_properties=True, chunk_size=100))
+        assert iterated == listed.data
+        assert len(iterated) == len(file_names) + 1
+        assert sorted(each['href'].split('/')[-1] for each in iterated[1:]) == file_names
+
+        with self.assertRaises(ValueError):
+            list(self.nxc_local.iter_folder(self.user_username, "nonexistent_folder"))
+
+        self.nxc_local.delete_path(self.user_username, folder_name)
+
+    def test_walk(self):
+        folder_name = "test_walk"
+        subfolders = ["sub_1", "sub_2", "sub_2/sub_3"]
+        self.nxc_local.create_folder(self.user_username, folder_name)
+        for subfolder in subfolders:
+            subfolder_path = "/".join([folder_name, subfolder])
+            self.nxc_local.create_folder(self.user_username, subfolder_path)
+            self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                                "/".join([subfolder_path, "test_file"]))
+
+        walked = {dirpath: (dirs, files)
+                  for dirpath, dirs, files in self.nxc_local.walk(self.user_username, folder_name,
+                                                                  max_workers=2)}
+        assert sorted(walked) == [folder_name] + ["/".join([folder_name, subfolder])
+                                                  for subfolder in subfolders]
+        dirs, files = walked[folder_name]
+        assert sorted(each['href'].rstrip('/').split('/')[-1] for each in dirs) == ["sub_1", "sub_2"]
+        assert files == []
+        dirs, files = walked["/".join([folder_name, "sub_2/sub_3"])]
+        assert dirs == []
+        assert [each['href'].split('/')[-1] for each in files] == ["test_file"]
+
+        # subfolders removed from dirs are not walked
+        walked = []
+        for dirpath, dirs, files in self.nxc_local.walk(self.user_username, folder_name):
+            walked.append(dirpath)
+            dirs[:] = [each for each in dirs if not each['href'].endswith("sub_2/")]
+        assert sorted(walked) == [folder_name, "/".join([folder_name, "sub_1"])]
+
+        self.nxc_local.delete_path(self.user_username, folder_name)
+
+    def test_changes_since(self):
+        folder_name = "test_changes_since"
+        self.nxc_local.create_folder(self.user_username, folder_name)
+        self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                            folder_name + "/test_file_1")
+        res = self.nxc_local.changes_since(self.user_username, folder_name)
+        if not res.is_ok:
+            self.skipTest("Server doesn't support sync-collection report for files")
+        assert res.data['sync_token']
+        assert any(each['href'].endswith("test_file_1") for each in res.data['changed'])
+
+        self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                            folder_name + "/test_file_2")
+        self.nxc_local.delete_path(self.user_username, folder_name + "/test_file_1")
+        res = self.nxc_local.changes_since(self.user_username, folder_name,
+                                           sync_token=res.data['sync_token'])
+        assert res.is_ok
+        assert [each['href'].split('/')[-1] for each in res.data['changed']
+                if each['href'].endswith("test_file_2")] == ["test_file_2"]
+        assert [href.split('/')[-1] for href in res.data['removed']] == ["test_file_1"]
+
+        self.nxc_local.delete_path(self.user_username, folder_name)
+
+    def test_search_files(self):
+        folder_name = "test_search_files"
+        self.nxc_local.create_folder(self.user_username, folder_name)
+        for idx in range(5):
+            self.nxc_local.upload_file_contents(self.user_username, b"x" * (idx + 1),
+                                                "{}/test_file_{}.txt".format(folder_name, idx))
+
+        found = list(self.nxc_local.search_files(self.user_username, folder_name,
+                                                 where=[("size", "gt", 2)], order_by="-size",
+                                                 page_size=2))
+        assert [each['href'].split('/')[-1] for each in found] == [
+            "test_file_4.txt", "test_file_3.txt", "test_file_2.txt"]
+
+        found = list(self.nxc_local.search_files(self.user_username, folder_name,
+                                                 where=[("displayname", "like", "test_file_%")],
+                                                 limit=2))
+        assert len(found) == 2
+
+        with self.assertRaises(ValueError):
+            list(self.nxc_local.search_files(self.user_username, where=[("size", "between", 1)]))
+
+        self.nxc_local.delete_path(self.user_username, folder_name)
+
     def test_upload_download_file(self):
         file_name = "test_file"
         file_content = "test file content"
@@ -164,6 +267,208 @@ class TestWebDAV(LocalNxcUserMixin, BaseTestCase):
         os.remove(file_local_path)
 
 
+    def test_download_file_streaming(self):
+        file_name = "test_file_streaming"
+        file_content = "test file content " * 1000
+        timestamp = timestamp_to_epoch_time("Mon, 20 Jan 2020 20:41:00 GMT")
+        self.create_and_upload_file(file_name, file_content, timestamp)
+        os.remove(file_name)
+
+        # iterate over file contents by chunks
+        chunks = list(self.nxc_local.iter_file_contents(self.user_username, file_name,
+                                                        chunk_size=1000))
+        assert len(chunks) == 18
+        assert all(len(chunk) == 1000 for chunk in chunks)
+        assert b"".join(chunks).decode() == file_content
+
+        # download to file object
+        file_object = io.BytesIO()
+        self.nxc_local.download_file(self.user_username, file_name, local_path=file_object,
+                                     chunk_size=1000)
+        assert file_object.getvalue().decode() == file_content
+
+        # download to given local path
+        local_path = os.path.abspath("test_file_streaming_local")
+        self.nxc_local.download_file(self.user_username, file_name, local_path=local_path)
+        with open(local_path, 'r') as f:
+            assert f.read() == file_content
+        assert os.path.getmtime(local_path) == timestamp
+        # existing local file isn't overwritten
+        with self.assertRaises(ValueError):
+            self.nxc_local.download_file(self.user_username, file_name, local_path=local_path)
+        os.remove(local_path)
+
+        # nonexistent file
+        with self.assertRaises(ValueError):
+            list(self.nxc_local.iter_file_contents(self.user_username, "nonexistent_file"))
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+
+    def test_download_file_streaming_connection_lost(self):
+        file_name = "test_file_streaming_lost"
+        self.create_and_upload_file(file_name, "test file content " * 1000)
+        os.remove(file_name)
+
+        def broken_iter_content(response, chunk_size=1):
+            yield b"test file content "
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+        # connection error while body is read is raised as for any other request
+        with patch.object(requests.Response, 'iter_content', broken_iter_content):
+            with self.assertRaises(NextCloudConnectionError):
+                list(self.nxc_local.iter_file_contents(self.user_username, file_name))
+            with self.assertRaises(NextCloudConnectionError):
+                self.nxc_local.download_file(self.user_username, file_name,
+                                             local_path=io.BytesIO())
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+
+    def test_upload_stream(self):
+        file_name = "test_file_upload_stream"
+        chunks = [b"chunk %d " % idx * 100 for idx in range(10)]
+        timestamp_str = "Mon, 20 Jan 2020 20:41:00 GMT"
+        timestamp = timestamp_to_epoch_time(timestamp_str)
+
+        # upload from generator
+        res = self.nxc_local.upload_stream(self.user_username, (chunk for chunk in chunks),
+                                           file_name, timestamp)
+        assert res.is_ok
+        assert res.raw.status_code == self.CREATED_CODE
+        folder_info = self.nxc_local.list_folders(self.user_username, path=file_name)
+        assert folder_info.data[0]["last_modified"] == timestamp_str
+        assert b"".join(self.nxc_local.iter_file_contents(self.user_username, file_name)) == \
+            b"".join(chunks)
+
+        # upload from file object
+        res = self.nxc_local.upload_stream(self.user_username, io.BytesIO(b"".join(chunks[:5])),
+                                           file_name)
+        assert res.is_ok
+        assert res.raw.status_code == self.NO_CONTENT_CODE
+        assert b"".join(self.nxc_local.iter_file_contents(self.user_username, file_name)) == \
+            b"".join(chunks[:5])
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+
+    def test_upload_file_chunked(self):
+        file_name = "test_file_chunked"
+        file_content = "chunked upload content " * 500
+        with open(file_name, "w") as f:
+            f.write(file_content)
+        file_local_path = os.path.abspath(file_name)
+        journal_path = file_local_path + ".journal"
+        timestamp_str = "Mon, 20 Jan 2020 20:41:00 GMT"
+        timestamp = timestamp_to_epoch_time(timestamp_str)
+
+        res = self.nxc_local.upload_file_chunked(self.user_username, file_local_path, file_name,
+                                                 timestamp=timestamp, chunk_size=1000,
+                                                 max_workers=3, journal_path=journal_path)
+        assert res.is_ok
+        # journal is removed after successful upload
+        assert not os.path.exists(journal_path)
+        folder_info = self.nxc_local.list_folders(self.user_username, path=file_name)
+        assert folder_info.data[0]["last_modified"] == timestamp_str
+        assert folder_info.data[0]["content_length"] == str(len(file_content))
+        assert b"".join(self.nxc_local.iter_file_contents(self.user_username, file_name)) == \
+            file_content.encode()
+
+        # too many chunks
+        with self.assertRaises(ValueError):
+            self.nxc_local.upload_file_chunked(self.user_username, file_local_path, file_name,
+                                               chunk_size=1)
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+        os.remove(file_local_path)
+
+    def test_upload_file_chunked_resume(self):
+        file_name = "test_file_chunked_resume"
+        file_content = "chunked upload content " * 500
+        with open(file_name, "w") as f:
+            f.write(file_content)
+        file_local_path = os.path.abspath(file_name)
+        journal_path = file_local_path + ".journal"
+        webdav = self.nxc_local.functionality_classes[-1]
+        put_chunk = webdav._uploads_requester.put_chunk
+
+        def failing_put_chunk(url, *args, **kwargs):
+            if url.endswith("/3"):
+                raise NextCloudConnectionError("Connection reset")
+            return put_chunk(url, *args, **kwargs)
+
+        with patch.object(webdav._uploads_requester, 'put_chunk', side_effect=failing_put_chunk):
+            with self.assertRaises(NextCloudConnectionError):
+                self.nxc_local.upload_file_chunked(self.user_username, file_local_path, file_name,
+                                                   chunk_size=1000, journal_path=journal_path)
+        assert os.path.exists(journal_path)
+
+        # only the missing chunk is uploaded again, then the file is assembled
+        with patch.object(webdav._uploads_requester, 'put_chunk', side_effect=put_chunk) as patched:
+            res = self.nxc_local.upload_file_chunked(self.user_username, file_local_path,
+                                                     file_name, chunk_size=1000,
+                                                     journal_path=journal_path)
+        assert res.is_ok
+        assert [call[1]['url'].split('/')[-1] for call in patched.call_args_list] == ["3"]
+        assert not os.path.exists(journal_path)
+        assert b"".join(self.nxc_local.iter_file_contents(self.user_username, file_name)) == \
+            file_content.encode()
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+        os.remove(file_local_path)
+
+    def test_download_file_parallel(self):
+        file_name = "test_file_parallel"
+        file_content = "parallel download content " * 500
+        timestamp = timestamp_to_epoch_time("Mon, 20 Jan 2020 20:41:00 GMT")
+        self.create_and_upload_file(file_name, file_content, timestamp)
+        os.remove(file_name)
+
+        local_path = os.path.abspath(file_name)
+        self.nxc_local.download_file_parallel(self.user_username, file_name, local_path,
+                                              range_size=1000, max_workers=3)
+        with open(local_path, 'r') as f:
+            assert f.read() == file_content
+        assert os.path.getmtime(local_path) == timestamp
+        # partial file and journal are removed
+        assert not os.path.exists(local_path + ".part")
+        assert not os.path.exists(local_path + ".part.journal")
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+        os.remove(local_path)
+
+    def test_download_file_parallel_resume(self):
+        file_name = "test_file_parallel_resume"
+        file_content = "parallel download content " * 500
+        self.create_and_upload_file(file_name, file_content)
+        os.remove(file_name)
+        local_path = os.path.abspath(file_name)
+        webdav = self.nxc_local.functionality_classes[-1]
+        download = webdav.requester.download
+
+        def failing_download(*args, **kwargs):
+            if kwargs['headers']['Range'].startswith("bytes=3000-"):
+                raise NextCloudConnectionError("Connection reset")
+            return download(*args, **kwargs)
+
+        with patch.object(webdav.requester, 'download', side_effect=failing_download):
+            with self.assertRaises(NextCloudConnectionError):
+                self.nxc_local.download_file_parallel(self.user_username, file_name, local_path,
+                                                      range_size=1000, max_workers=3)
+        assert os.path.exists(local_path + ".part")
+        assert os.path.exists(local_path + ".part.journal")
+
+        # only the missing range is downloaded again
+        with patch.object(webdav.requester, 'download', side_effect=download) as patched:
+            self.nxc_local.download_file_parallel(self.user_username, file_name, local_path,
+                                                  range_size=1000, max_workers=3)
+        assert [call[1]['headers']['Range'] for call in patched.call_args_list] == \
+            ["bytes=3000-3999"]
+        with open(local_path, 'r') as f:
+            assert f.read() == file_content
+        assert not os.path.exists(local_path + ".part")
+        assert not os.path.exists(local_path + ".part.journal")
+
+        self.nxc_local.delete_path(self.user_username, file_name)
+        os.remove(local_path)
+
     def test_create_folder(self):
         folder_name = "test folder5"
         res = self.nxc_local.create_folder(self.user_username, folder_name)
@@ -197,6 +502,168 @@ class TestWebDAV(LocalNxcUserMixin, BaseTestCase):
         assert res.is_ok
         assert res.raw.status_code == self.NO_CONTENT_CODE
 
+    def test_assure_tree_exists_remembers_folders(self):
+        tree_path = "test_assure_tree/nested/folder"
+        assert self.nxc_local.assure_tree_exists(self.user_username, tree_path)
+        assert self.nxc_local.list_folders(self.user_username, path=tree_path).is_ok
+
+        # known folders cost no requests
+        webdav = self.nxc_local.functionality_classes[-1]
+        with patch.object(webdav.requester, 'send') as send:
+            assert self.nxc_local.assure_tree_exists(self.user_username, tree_path)
+            assert self.nxc_local.assure_tree_exists(self.user_username, "test_assure_tree/nested")
+        assert not send.called
+
+        # deleted folders are forgotten
+        self.nxc_local.delete_path(self.user_username, "test_assure_tree/nested")
+        assert self.nxc_local.assure_tree_exists(self.user_username, tree_path)
+        assert self.nxc_local.list_folders(self.user_username, path=tree_path).is_ok
+
+        self.nxc_local.delete_path(self.user_username, "test_assure_tree")
+
+    def test_upload_files(self):
+        file_name = "test_file"
+        with open(file_name, "w") as f:
+            f.write("content")
+        remote_paths = ["test_upload_files/{}/{}_{}".format(idx % 2, file_name, idx)
+                        for idx in range(4)]
+        results = self.nxc_local.upload_files(self.user_username,
+                                              [(file_name, path) for path in remote_paths],
+                                              max_workers=2)
+        assert all(res.is_ok for res in results)
+        for path in remote_paths:
+            assert self.nxc_local.list_folders(self.user_username, path=path).is_ok
+
+        os.remove(file_name)
+        self.nxc_local.delete_path(self.user_username, "test_upload_files")
+
+    def test_download_folder_archive(self):
+        timestamp = 1500000000
+        folder_name = "test_download_folder_archive"
+        self.nxc_local.assure_tree_exists(self.user_username, folder_name + "/sub")
+        self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                            folder_name + "/sub/test_file", timestamp)
+        with tempfile.TemporaryDirectory() as local_dir:
+            archive_path = os.path.join(local_dir, "archive.zip")
+            try:
+                self.nxc_local.download_folder_archive(self.user_username, folder_name, archive_path)
+            except ValueError:
+                self.skipTest("Server doesn't serve archives of folders over WebDAV")
+            with zipfile.ZipFile(archive_path) as archive:
+                assert any(name.endswith("sub/test_file") for name in archive.namelist())
+
+            extract_dir = os.path.join(local_dir, "extracted")
+            self.nxc_local.download_folder_archive(self.user_username, folder_name, extract_dir,
+                                                   extract=True)
+            file_paths = [os.path.join(dirpath, name)
+                          for dirpath, _, files in os.walk(extract_dir) for name in files]
+            assert len(file_paths) == 1
+            with open(file_paths[0], "rb") as f:
+                assert f.read() == b"content"
+            assert int(os.path.getmtime(file_paths[0])) == timestamp
+
+        self.nxc_local.delete_path(self.user_username, folder_name)
+
+    def test_upload_file_if_changed(self):
+        file_name = "test_file"
+        with open(file_name, "w") as f:
+            f.write("content")
+        res = self.nxc_local.upload_file_if_changed(self.user_username, file_name, file_name)
+        assert res.is_ok
+        res = self.nxc_local.list_folders(self.user_username, path=file_name, all_properties=True)
+        assert res.data[0]['check_sums'].lower().startswith("sha1:")
+        # the same contents are not uploaded again
+        assert self.nxc_local.upload_file_if_changed(self.user_username, file_name, file_name) is None
+
+        with open(file_name, "w") as f:
+            f.write("new content")
+        res = self.nxc_local.upload_file_if_changed(self.user_username, file_name, file_name)
+        assert res.is_ok
+        assert b"".join(self.nxc_local.iter_file_contents(self.user_username,
+                                                          file_name)) == b"new content"
+
+        os.remove(file_name)
+        self.nxc_local.delete_path(self.user_username, file_name)
+
+    def test_bulk_upload(self):
+        timestamp = 1500000000
+        files = [(b"content %d" % idx, "test_bulk_upload/{}/test_file_{}".format(idx % 2, idx),
+                  timestamp) for idx in range(5)]
+        results = self.nxc_local.bulk_upload(self.user_username, files, max_files=2)
+        assert [res.remote_filepath for res in results] == [each[1] for each in files]
+        assert all(res.is_ok for res in results)
+
+        res = self.nxc_local.list_folders(self.user_username, path=files[3][1])
+        assert res.is_ok
+        assert timestamp_to_epoch_time(res.data[0]['last_modified']) == timestamp
+        assert b"".join(self.nxc_local.iter_file_contents(self.user_username,
+                                                          files[3][1])) == files[3][0]
+
+        self.nxc_local.delete_path(self.user_username, "test_bulk_upload")
+
+    def test_delete_move_copy_paths(self):
+        folder_name = "test_paths"
+        file_paths = ["{}/test_file_{}".format(folder_name, idx) for idx in range(4)]
+        for path in file_paths:
+            self.nxc_local.upload_file_contents(self.user_username, b"content", path)
+
+        copied = list(self.nxc_local.copy_paths(self.user_username,
+                                                [(path, path + "_copy") for path in file_paths],
+                                                max_workers=2))
+        assert sorted(each[:2] for each in copied) == [(path, path + "_copy") for path in file_paths]
+        assert all(res.is_ok and exception is None for _, _, res, exception in copied)
+
+        moved = list(self.nxc_local.move_paths(self.user_username,
+                                               [(path, path + "_moved") for path in file_paths]))
+        assert all(res.is_ok and exception is None for _, _, res, exception in moved)
+        assert not self.nxc_local.list_folders(self.user_username, path=file_paths[0]).is_ok
+
+        deleted_paths = [path + "_copy" for path in file_paths[:2]] + [folder_name]
+        deleted = {path: res for path, res, exception in
+                   self.nxc_local.delete_paths(self.user_username, deleted_paths)}
+        assert sorted(deleted) == sorted(deleted_paths)
+        assert all(res.is_ok for res in deleted.values())
+        # paths under deleted folder are not deleted separately
+        assert deleted[deleted_paths[0]] is deleted[folder_name]
+        assert not self.nxc_local.list_folders(self.user_username, path=folder_name).is_ok
+
+    def test_delete_paths_same_paths(self):
+        folder_name = "test_paths_same"
+        self.nxc_local.upload_file_contents(self.user_username, b"content",
+                                            folder_name + "/test_file")
+        deleted_paths = [folder_name, "/{}/".format(folder_name), folder_name,
+                         folder_name + "/test_file", "/{}/test_file".format(folder_name)]
+        deleted = list(self.nxc_local.delete_paths(self.user_username, deleted_paths))
+        # every given path gets outcome, even duplicates and other spellings
+        assert sorted(path for path, _, _ in deleted) == sorted(deleted_paths)
+        assert len({id(res) for _, res, _ in deleted}) == 1
+        assert all(res.is_ok and exception is None for _, res, exception in deleted)
+        assert not self.nxc_local.list_folders(self.user_username, path=folder_name).is_ok
+
+    def test_delete_paths_failure(self):
+        file_paths = ["test_paths_failure_{}".format(idx) for idx in range(3)]
+        for path in file_paths:
+            self.nxc_local.upload_file_contents(self.user_username, b"content", path)
+        webdav = self.nxc_local.functionality_classes[-1]
+        delete_path = webdav.delete_path
+
+        def failing_delete_path(uid, path):
+            if path == file_paths[1]:
+                raise NextCloudConnectionError("Connection reset")
+            return delete_path(uid, path)
+
+        # failed path is yielded with its exception, other paths are still deleted
+        with patch.object(webdav, 'delete_path', side_effect=failing_delete_path):
+            deleted = {path: (res, exception) for path, res, exception in
+                       self.nxc_local.delete_paths(self.user_username, file_paths)}
+        assert sorted(deleted) == sorted(file_paths)
+        res, exception = deleted.pop(file_paths[1])
+        assert res is None
+        assert isinstance(exception, NextCloudConnectionError)
+        assert all(res.is_ok and exception is None for res, exception in deleted.values())
+
+        self.nxc_local.delete_path(self.user_username, file_paths[1])
+
     def test_delete_path(self):
         # test delete empty folder
         new_path_name = "path_to_delete"